@@ -1,82 +1,506 @@
 from . import api_bp
-from flask import jsonify, current_app
-from chroma_utils import parse_ddl_statements, ALL_DDL_STATEMENTS, get_particles_collection
+from flask import jsonify, current_app, request, Response, stream_with_context, url_for
+import base64
+import json
+import os
+import secrets
+import sys
+from cache_utils import LRUTTLCache
+from metadata_index import metadata_index, get_metadata_index, UnsupportedFilterError, InvalidFilterError
+from lexical_index import lexical_index, get_lexical_index, reciprocal_rank_fusion
+from schema_store import get_schema_snapshot
+from schema_graph import get_schema_graph, join_condition
+from serving import bounded, get_serving_stats, SERVING_MODE
+from jobs import get_job_queue, SUCCEEDED
+from metrics import init_request_metrics, render_prometheus, stage
+from sharding import get_sharding_stats
+from chroma_utils import (
+    COLLECTION_NAME, get_pool_stats, get_readiness, with_collection, get_collection_version,
+    get_embedding_cache_stats, get_embedding_function, register_write_listener, document_etag
+)
 
-# Cache for parsed DDL schema
-_parsed_schema_cache = None
+# Cache for /api/schema/search results. Entries are tagged with the collection version, so any
+# write (populate_schema_in_chromadb, deletes, ...) makes them stale immediately.
+_search_results_cache = LRUTTLCache(
+    max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 512)),
+    ttl_seconds=float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", 300)),
+)
+# Candidates taken from each ranking (vector and BM25) before fusing free-text schema searches
+SCHEMA_SEARCH_CANDIDATES = int(os.environ.get("SCHEMA_SEARCH_CANDIDATES", 50))
+
+# Server-side rankings behind /api/vectors/search_content cursors (see search_vector_by_content)
+SEARCH_CURSOR_WINDOW = int(os.environ.get("SEARCH_CURSOR_WINDOW", 1000))
+MAX_CONTENT_PAGE_SIZE = 1000
+MAX_CONTENT_QUERIES = 32
+STREAM_FETCH_BATCH_SIZE = 256
+CONTENT_INCLUDE_FIELDS = {"documents", "metadatas", "distances", "embeddings"}
+DEFAULT_CONTENT_INCLUDE = ("documents", "metadatas", "distances")
+_search_rankings_cache = LRUTTLCache(max_entries=256, ttl_seconds=600)
+
+MAX_METADATA_PAGE_SIZE = 1000
+METADATA_INCLUDE_FIELDS = {"documents", "metadatas", "embeddings"}
+
+# Recently fetched documents for /api/vectors/query_by_id, keyed by id. Entries are dropped by
+# the write listener below when their document is written, so cached ETags are always current.
+_documents_cache = LRUTTLCache(
+    max_entries=int(os.environ.get("DOCUMENT_CACHE_MAX_ENTRIES", 2048)),
+    ttl_seconds=float(os.environ.get("DOCUMENT_CACHE_TTL_SECONDS", 600)),
+)
+MAX_IDS_PER_QUERY = 1000
+ID_INCLUDE_FIELDS = {"documents", "metadatas", "embeddings"}
+DEFAULT_ID_INCLUDE = ("documents", "metadatas")
+
+def _on_collection_write(collection_name, upserted, deleted_ids, reset):
+    if collection_name != COLLECTION_NAME:
+        return
+    if reset:
+        _documents_cache.clear()
+        return
+    for doc_id in list(deleted_ids or ()) + list((upserted or {}).get("ids", ())):
+        _documents_cache.pop(doc_id)
+
+register_write_listener(_on_collection_write)
+
+# Request count/latency/in-flight metrics for every API route (see /api/metrics)
+init_request_metrics(api_bp)
 
 def get_parsed_schema():
-    global _parsed_schema_cache
-    if _parsed_schema_cache is None:
-        current_app.logger.info("Parsing DDL statements for schema cache...")
-        _parsed_schema_cache = parse_ddl_statements(ALL_DDL_STATEMENTS)
-        current_app.logger.info(f"DDL parsing complete. Parsed {len(_parsed_schema_cache)} tables.")
-    return _parsed_schema_cache
+    # Parsed DDL schema; re-parsed (and re-serialized) only when the DDL source changes
+    return get_schema_snapshot().schema
+
+def _payload_response(payload):
+    # Serve a pre-encoded schema payload, honouring If-None-Match and Accept-Encoding
+    encoding = payload.choose_encoding(request.accept_encodings)
+    headers = {"ETag": f'"{payload.etag_for(encoding)}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if payload.matches(request.if_none_match, encoding):
+        return Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(payload.variant(encoding), status=200, mimetype="application/json", headers=headers)
 
 @api_bp.route('/status')
 def status():
-    return jsonify({'status': 'API is running', 'message': 'Welcome to the Chroma Server API!'})
+    # Liveness: answered without touching Chroma. "ready" tells whether vector routes are warm.
+    readiness = get_readiness()
+    return jsonify({
+        'status': 'API is running', 'message': 'Welcome to the Chroma Server API!',
+        'live': True, 'ready': readiness["ready"], 'readiness': readiness
+    })
+
+@api_bp.route('/ready')
+def ready():
+    # Readiness probe: 503 until the background warm-up has loaded Chroma and the model
+    readiness = get_readiness()
+    return jsonify(readiness), 200 if readiness["ready"] else 503
 
 @api_bp.route('/schema')
 def get_schema():
     try:
-        schema_data = get_parsed_schema()
-        if not schema_data:
+        snapshot = get_schema_snapshot()
+        if not snapshot.schema:
             return jsonify({"error": "Schema could not be parsed or is empty"}), 500
-        return jsonify(schema_data)
+        return _payload_response(snapshot.full)
     except Exception as e:
         current_app.logger.error(f"Error getting schema: {e}", exc_info=True)
         return jsonify({"error": "An error occurred while retrieving the schema", "details": str(e)}), 500
 
+@api_bp.route('/schema/<string:table_name>')
+def get_table_schema(table_name):
+    try:
+        payload = get_schema_snapshot().table(table_name)
+        if payload is None:
+            return jsonify({"error": f"Table '{table_name}' not found in schema"}), 404
+        return _payload_response(payload)
+    except Exception as e:
+        current_app.logger.error(f"Error getting schema for table {table_name}: {e}", exc_info=True)
+        return jsonify({"error": "An error occurred while retrieving the table schema", "details": str(e)}), 500
+
+@api_bp.route('/schema/<string:table_name>/neighbors')
+def get_table_neighbors(table_name):
+    # Tables one foreign key away in either direction, from the precomputed FK graph
+    graph = get_schema_graph()
+    if table_name not in graph.tables:
+        return jsonify({"error": f"Table '{table_name}' not found in schema"}), 404
+    return jsonify({"table": table_name, "neighbors": graph.neighbors(table_name)})
+
+@api_bp.route('/schema/<string:table_name>/references')
+def get_table_references(table_name):
+    graph = get_schema_graph()
+    if table_name not in graph.tables:
+        return jsonify({"error": f"Table '{table_name}' not found in schema"}), 404
+    return jsonify({"table": table_name, "references": graph.references.get(table_name, [])})
+
+@api_bp.route('/schema/<string:table_name>/referenced_by')
+def get_table_referenced_by(table_name):
+    graph = get_schema_graph()
+    if table_name not in graph.tables:
+        return jsonify({"error": f"Table '{table_name}' not found in schema"}), 404
+    return jsonify({"table": table_name, "referenced_by": graph.referenced_by.get(table_name, [])})
+
+@api_bp.route('/schema/join_path')
+def get_join_path():
+    source = request.args.get('from')
+    target = request.args.get('to')
+    if not source or not target:
+        return jsonify({"error": "Query parameters 'from' and 'to' are required."}), 400
+    graph = get_schema_graph()
+    unknown = [table_name for table_name in (source, target) if table_name not in graph.tables]
+    if unknown:
+        return jsonify({"error": f"Table(s) not found in schema: {', '.join(unknown)}"}), 404
+    path = graph.join_path(source, target)
+    if path is None:
+        return jsonify({"error": f"No foreign-key path between '{source}' and '{target}'"}), 404
+    return jsonify({
+        "from": source,
+        "to": target,
+        "hops": len(path),
+        "path": [{**edge, "join": join_condition(edge)} for edge in path]
+    })
+
 @api_bp.route('/collection/info')
+@bounded()
 def collection_info():
     try:
-        collection = get_particles_collection()
-        return jsonify({
+        return jsonify(with_collection(lambda collection: {
             "name": collection.name,
             "id": str(collection.id), # Convert UUID to string
             "count": collection.count(),
             "metadata": collection.metadata if collection.metadata else "No metadata set for collection"
-        })
+        }))
     except Exception as e:
         current_app.logger.error(f"Error getting collection info: {e}", exc_info=True)
         return jsonify({"error": "An error occurred while retrieving collection information", "details": str(e)}), 500
 
-# Placeholder endpoints for future implementation
+@api_bp.route('/collection/pool')
+def collection_pool_stats():
+    # Client/collection handle reuse and init-time stats for the shared registry
+    return jsonify(get_pool_stats())
+
+@api_bp.route('/collection/shards')
+def collection_shards():
+    # Per-shard document counts and call timings (calls, avg/max/last seconds) to spot hot shards
+    try:
+        return jsonify(get_sharding_stats())
+    except Exception as e:
+        current_app.logger.error(f"Error getting shard stats: {e}", exc_info=True)
+        return jsonify({"error": "An error occurred while retrieving shard statistics", "details": str(e)}), 500
+
+@api_bp.route('/serving/stats')
+def serving_stats():
+    # Worker pool / queue occupancy and rejection counters for the async serving mode
+    return jsonify(get_serving_stats())
+
+@api_bp.route('/metrics')
+def prometheus_metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@api_bp.route('/cache/stats')
+def cache_stats():
+    return jsonify({
+        "collection_version": get_collection_version(),
+        "schema_search": _search_results_cache.get_stats(),
+        "content_search_cursors": _search_rankings_cache.get_stats(),
+        "documents_by_id": _documents_cache.get_stats(),
+        "metadata_index": metadata_index.get_stats(),
+        "lexical_index": lexical_index.get_stats(),
+        "numpy_search": _numpy_search_stats(),
+        "embeddings": get_embedding_cache_stats(),
+    })
+
+def _numpy_search_stats():
+    # numpy_search is imported on first schema search; until then there is nothing to report
+    module = sys.modules.get("numpy_search")
+    return module.numpy_index.get_stats() if module is not None else {"loaded": False}
+
 @api_bp.route('/vectors/query_by_id/<string:vector_id>')
+@bounded()
 def query_vector_by_id(vector_id):
-    # TODO: Implement actual ChromaDB query
-    return jsonify({
-        "message": "Placeholder: Query vector by ID",
-        "vector_id": vector_id,
-        "data": "Not yet implemented. This endpoint will return vector data for the given ID."
-    }), 501
+    # Single item with an ETag; a matching If-None-Match on a cached item is answered with 304
+    # without touching Chroma. ?include=documents,metadatas,embeddings picks the fields.
+    include = request.args.get('include', ','.join(DEFAULT_ID_INCLUDE)).split(',')
+    if not set(include) <= ID_INCLUDE_FIELDS:
+        return jsonify({"error": f"'include' must be a subset of {sorted(ID_INCLUDE_FIELDS)}."}), 400
+    try:
+        entries, _ = _get_documents_by_id([vector_id], include)
+        entry = entries.get(vector_id)
+        if entry is None:
+            return jsonify({"error": f"Vector '{vector_id}' not found."}), 404
+        headers = {"ETag": f'"{entry["etag"]}"', "Cache-Control": "no-cache"}
+        if request.if_none_match.contains(entry["etag"]):
+            return Response(status=304, headers=headers)
+        with stage("serialize"):
+            response = jsonify(_format_id_item(vector_id, entry, include))
+        response.headers.update(headers)
+        return response
+    except Exception as e:
+        current_app.logger.error(f"API: Error querying vector {vector_id}: {e}", exc_info=True)
+        return jsonify({"error": "Failed to query vector by id", "details": str(e)}), 500
+
+@api_bp.route('/vectors/query_by_id', methods=['POST'])
+@bounded()
+def query_vectors_by_id():
+    # Bulk lookup: every id not in the document cache is resolved with one collection.get.
+    # "if_none_match" maps ids to ETags the client already holds; those ids come back in
+    # "not_modified" instead of "items".
+    payload = request.get_json(silent=True) or {}
+    ids = payload.get("ids")
+    include = payload.get("include", list(DEFAULT_ID_INCLUDE))
+    known_etags = payload.get("if_none_match") or {}
+    if not isinstance(ids, list) or not ids or not all(isinstance(doc_id, str) for doc_id in ids):
+        return jsonify({"error": "'ids' must be a non-empty list of strings."}), 400
+    if len(ids) > MAX_IDS_PER_QUERY:
+        return jsonify({"error": f"At most {MAX_IDS_PER_QUERY} ids per request."}), 400
+    if not isinstance(include, list) or not set(include) <= ID_INCLUDE_FIELDS:
+        return jsonify({"error": f"'include' must be a subset of {sorted(ID_INCLUDE_FIELDS)}."}), 400
+    if not isinstance(known_etags, dict):
+        return jsonify({"error": "'if_none_match' must be an object mapping ids to ETags."}), 400
+
+    try:
+        entries, cache_hits = _get_documents_by_id(ids, include)
+        with stage("serialize"):
+            items, not_modified, missing = [], [], []
+            for doc_id in dict.fromkeys(ids):
+                entry = entries.get(doc_id)
+                if entry is None:
+                    missing.append(doc_id)
+                elif str(known_etags.get(doc_id, "")).strip('"') == entry["etag"]:
+                    not_modified.append(doc_id)
+                else:
+                    items.append(_format_id_item(doc_id, entry, include))
+            return jsonify({"items": items, "not_modified": not_modified, "missing": missing, "cache_hits": cache_hits})
+    except Exception as e:
+        current_app.logger.error(f"API: Error querying vectors by id: {e}", exc_info=True)
+        return jsonify({"error": "Failed to query vectors by id", "details": str(e)}), 500
+
+def _get_documents_by_id(ids, include):
+    # {id: {"document", "metadata", "etag"[, "embedding"]}} for the ids that exist, and the number
+    # served from the document cache. Embeddings are only fetched (and cached) when asked for.
+    entries = {}
+    to_fetch = []
+    for doc_id in dict.fromkeys(ids):
+        entry = _documents_cache.get(doc_id)
+        if entry is not None and ("embeddings" not in include or "embedding" in entry):
+            entries[doc_id] = entry
+        else:
+            to_fetch.append(doc_id)
+    cache_hits = len(entries)
+    if to_fetch:
+        fields = ["documents", "metadatas"] + (["embeddings"] if "embeddings" in include else [])
+        version = get_collection_version()
+        results = with_collection(lambda collection: collection.get(ids=to_fetch, include=fields))
+        # Not cached if anything was written while fetching; the listener may already have run
+        cacheable = get_collection_version() == version
+        for i, doc_id in enumerate(results["ids"]):
+            document, metadata = results["documents"][i], results["metadatas"][i]
+            entry = {"document": document, "metadata": metadata, "etag": document_etag(document, metadata)}
+            if "embeddings" in fields:
+                entry["embedding"] = [float(x) for x in results["embeddings"][i]]
+            entries[doc_id] = entry
+            if cacheable:
+                _documents_cache.set(doc_id, entry)
+    return entries, cache_hits
+
+def _format_id_item(doc_id, entry, include):
+    item = {"id": doc_id, "etag": entry["etag"]}
+    if "documents" in include:
+        item["document"] = entry["document"]
+    if "metadatas" in include:
+        item["metadata"] = entry["metadata"]
+    if "embeddings" in include:
+        item["embedding"] = entry["embedding"]
+    return item
 
 @api_bp.route('/vectors/query_by_metadata', methods=['POST'])
+@bounded()
 def query_vector_by_metadata():
-    # Expects JSON payload with metadata filters
-    # from flask import request
-    # metadata_filters = request.json
-    # TODO: Implement actual ChromaDB query with metadata filters
-    return jsonify({
-        "message": "Placeholder: Query vector by metadata",
-        # "filters_received": metadata_filters, # Uncomment when ready to process
-        "data": "Not yet implemented. This endpoint will search vectors based on provided metadata."
-    }), 501
+    # Filters on indexed keys (equality, $in, $and, $or) are answered by the in-process metadata
+    # index; Chroma is only asked for the bodies of the final page of ids. Other filters fall
+    # back to collection.get(where=...).
+    payload = request.get_json(silent=True) or {}
+    where = payload.get("where")
+    limit = payload.get("limit", 50)
+    offset = payload.get("offset", 0)
+    include = payload.get("include", ["documents", "metadatas"])
+    if not isinstance(where, dict) or not where:
+        return jsonify({"error": "'where' must be a non-empty metadata filter object."}), 400
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_METADATA_PAGE_SIZE:
+        return jsonify({"error": f"'limit' must be an integer between 1 and {MAX_METADATA_PAGE_SIZE}."}), 400
+    if not isinstance(offset, int) or offset < 0:
+        return jsonify({"error": "'offset' must be a non-negative integer."}), 400
+    if not isinstance(include, list) or not set(include) <= METADATA_INCLUDE_FIELDS:
+        return jsonify({"error": f"'include' must be a subset of {sorted(METADATA_INCLUDE_FIELDS)}."}), 400
+
+    try:
+        try:
+            with stage("index_lookup"):
+                matching_ids = get_metadata_index().query(where)
+        except InvalidFilterError as e:
+            return jsonify({"error": str(e)}), 400
+        except UnsupportedFilterError as e:
+            current_app.logger.info(f"API: Metadata filter not indexable ({e}); falling back to ChromaDB.")
+            results = with_collection(lambda collection: collection.get(
+                where=where, limit=limit, offset=offset, include=include
+            ))
+            with stage("serialize"):
+                items = []
+                for i, doc_id in enumerate(results["ids"]):
+                    item = {"id": doc_id}
+                    if "documents" in include:
+                        item["document"] = results["documents"][i]
+                    if "metadatas" in include:
+                        item["metadata"] = results["metadatas"][i]
+                    if "embeddings" in include:
+                        item["embedding"] = [float(x) for x in results["embeddings"][i]]
+                    items.append(item)
+                return jsonify({"total": None, "offset": offset, "items": items, "served_by": "chroma"})
+
+        page_ids = matching_ids[offset:offset + limit]
+        bodies = _fetch_bodies(page_ids, include)
+        with stage("serialize"):
+            return jsonify({
+                "total": len(matching_ids),
+                "offset": offset,
+                "items": [{"id": doc_id, **bodies.get(doc_id, {})} for doc_id in page_ids],
+                "served_by": "metadata_index"
+            })
+    except Exception as e:
+        current_app.logger.error(f"API: Error querying vectors by metadata: {e}", exc_info=True)
+        return jsonify({"error": "Failed to query vectors by metadata", "details": str(e)}), 500
 
 @api_bp.route('/vectors/search_content', methods=['POST'])
+@bounded()
 def search_vector_by_content():
-    # Expects JSON payload with search query
-    # from flask import request
-    # search_payload = request.json
-    # query_text = search_payload.get('query')
-    # n_results = search_payload.get('n_results', 10)
-    # TODO: Implement actual ChromaDB content search (similarity search)
-    return jsonify({
-        "message": "Placeholder: Search vector by content",
-        # "query_received": query_text, # Uncomment
-        "data": "Not yet implemented. This endpoint will perform a similarity search based on content."
-    }), 501
+    # Batched similarity search with cursor pagination.
+    # The first call ranks up to SEARCH_CURSOR_WINDOW ids per query in a single collection.query
+    # (ids and distances only) and keeps that ranking server-side; the opaque cursor points into
+    # it, so later pages only fetch the bodies of their own ids instead of re-querying with an
+    # ever larger n_results. With "stream": true (or Accept: application/x-ndjson) items are
+    # written as newline-delimited JSON and bodies are fetched in small batches.
+    payload = request.get_json(silent=True) or {}
+    page_size = payload.get("n_results", 10)
+    include = payload.get("include", list(DEFAULT_CONTENT_INCLUDE))
+    if not isinstance(page_size, int) or not 1 <= page_size <= MAX_CONTENT_PAGE_SIZE:
+        return jsonify({"error": f"'n_results' must be an integer between 1 and {MAX_CONTENT_PAGE_SIZE}."}), 400
+    if not isinstance(include, list) or not set(include) <= CONTENT_INCLUDE_FIELDS:
+        return jsonify({"error": f"'include' must be a subset of {sorted(CONTENT_INCLUDE_FIELDS)}."}), 400
+    stream = bool(payload.get("stream")) or request.accept_mimetypes.best == "application/x-ndjson"
+
+    try:
+        if payload.get("cursor"):
+            try:
+                token, offset = _decode_search_cursor(payload["cursor"])
+            except ValueError:
+                return jsonify({"error": "Invalid cursor."}), 400
+            ranking = _search_rankings_cache.get(token, version=get_collection_version())
+            if ranking is None:
+                return jsonify({"error": "Cursor expired or the collection changed; repeat the search without a cursor."}), 410
+        else:
+            queries = payload.get("queries") or ([payload["query"]] if payload.get("query") else None)
+            if not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+                return jsonify({"error": "Provide 'query' (string) or 'queries' (list of non-empty strings)."}), 400
+            if len(queries) > MAX_CONTENT_QUERIES:
+                return jsonify({"error": f"At most {MAX_CONTENT_QUERIES} queries per request."}), 400
+            current_app.logger.info(f"API: Content search for {len(queries)} queries, page size {page_size}.")
+            token, ranking = _rank_content_queries(queries, payload.get("where"), payload.get("where_document"))
+            offset = 0
+
+        page_end = offset + page_size
+        longest = max(len(ids) for _, ids, _ in ranking["rankings"]) if ranking["rankings"] else 0
+        next_cursor = _encode_search_cursor(token, page_end) if page_end < longest else None
+        page = [(query, ids[offset:page_end], distances[offset:page_end]) for query, ids, distances in ranking["rankings"]]
+
+        if stream:
+            # In async serving mode the generator runs after this bounded view has returned, on
+            # the request thread; fetch the bodies here so all Chroma work stays on the pool.
+            bodies = _fetch_bodies([doc_id for _, ids, _ in page for doc_id in ids], include) if SERVING_MODE == "async" else None
+            return Response(
+                stream_with_context(_stream_content_page(page, include, next_cursor, bodies)),
+                mimetype="application/x-ndjson"
+            )
+
+        bodies = _fetch_bodies([doc_id for _, ids, _ in page for doc_id in ids], include)
+        with stage("serialize"):
+            return jsonify({
+                "results": [
+                    {"query": query, "items": [_format_content_item(doc_id, distance, bodies, include) for doc_id, distance in zip(ids, distances)]}
+                    for query, ids, distances in page
+                ],
+                "offset": offset,
+                "next_cursor": next_cursor
+            })
+    except Exception as e:
+        current_app.logger.error(f"API: Error in content search: {e}", exc_info=True)
+        return jsonify({"error": "Failed to search vectors by content", "details": str(e)}), 500
+
+def _rank_content_queries(queries, where, where_document):
+    version = get_collection_version()
+
+    def rank(collection):
+        window = min(SEARCH_CURSOR_WINDOW, collection.count())
+        if window == 0:
+            return {"ids": [[] for _ in queries], "distances": [[] for _ in queries]}
+        return collection.query(
+            query_texts=queries, n_results=window, where=where or None,
+            where_document=where_document or None, include=["distances"]
+        )
+
+    results = with_collection(rank)
+    ranking = {"rankings": [
+        (query, results["ids"][i], [float(d) for d in results["distances"][i]]) for i, query in enumerate(queries)
+    ]}
+    token = secrets.token_urlsafe(12)
+    _search_rankings_cache.set(token, ranking, version=version)
+    return token, ranking
+
+def _encode_search_cursor(token, offset):
+    raw = json.dumps({"r": token, "o": offset}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_search_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data["r"]), int(data["o"])
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+def _fetch_bodies(ids, include):
+    # One collection.get for the requested ids; distances come from the ranking, not from here.
+    fields = [field for field in include if field != "distances"]
+    unique_ids = list(dict.fromkeys(ids))
+    if not fields or not unique_ids:
+        return {}
+    results = with_collection(lambda collection: collection.get(ids=unique_ids, include=fields))
+    bodies = {}
+    for i, doc_id in enumerate(results["ids"]):
+        body = {}
+        if "documents" in fields:
+            body["document"] = results["documents"][i]
+        if "metadatas" in fields:
+            body["metadata"] = results["metadatas"][i]
+        if "embeddings" in fields:
+            body["embedding"] = [float(x) for x in results["embeddings"][i]]
+        bodies[doc_id] = body
+    return bodies
+
+def _format_content_item(doc_id, distance, bodies, include):
+    item = {"id": doc_id}
+    if "distances" in include:
+        item["distance"] = distance
+    item.update(bodies.get(doc_id, {}))
+    return item
+
+def _stream_content_page(page, include, next_cursor, prefetched_bodies=None):
+    # Bodies are fetched in small batches as items are written, unless they were prefetched
+    for query_index, (query, ids, distances) in enumerate(page):
+        for batch_start in range(0, len(ids), STREAM_FETCH_BATCH_SIZE):
+            batch_ids = ids[batch_start:batch_start + STREAM_FETCH_BATCH_SIZE]
+            bodies = prefetched_bodies if prefetched_bodies is not None else _fetch_bodies(batch_ids, include)
+            for doc_id, distance in zip(batch_ids, distances[batch_start:batch_start + STREAM_FETCH_BATCH_SIZE]):
+                item = _format_content_item(doc_id, distance, bodies, include)
+                item["query_index"] = query_index
+                yield json.dumps(item) + "\n"
+    yield json.dumps({"next_cursor": next_cursor}) + "\n"
 
 # Example of how to add data (for future reference, not used now as per instructions)
 # @api_bp.route('/vectors/add', methods=['POST'])
@@ -88,60 +512,240 @@ def search_vector_by_content():
 #     return jsonify({"message": "Placeholder: Add vector data"}), 501
 
 
-from chroma_utils import populate_schema_in_chromadb, get_particles_collection, parse_ddl_statements, ALL_DDL_STATEMENTS
-from flask import request # Added for request.args
+from chroma_utils import populate_schema_in_chromadb
 
 @api_bp.route('/schema/load_to_chroma', methods=['POST'])
 def load_schema_to_chroma():
-    current_app.logger.info("API: Attempting to load DDL schema into ChromaDB...")
-    try:
-        # This uses the global ALL_DDL_STATEMENTS and default collection
-        parsed_schemas = parse_ddl_statements(ALL_DDL_STATEMENTS) # Parse first
-        collection = get_particles_collection() # Get the collection
+    # Queued on the single-writer job queue; responds 202 with the job id right away
+    current_app.logger.info("API: Queueing DDL schema load into ChromaDB...")
+    return _submit_job("schema_load", {}, _run_schema_load)
 
-        # Call populate_schema_in_chromadb with the specific collection and parsed_schemas
-        num_docs_added = populate_schema_in_chromadb(collection=collection, parsed_schemas=parsed_schemas)
+def _run_schema_load(job):
+    # Uses the configured DDL source (read when the job starts) and the default collection
+    parsed_schemas = get_parsed_schema()
+    summary = with_collection(lambda collection: populate_schema_in_chromadb(
+        collection=collection, parsed_schemas=parsed_schemas,
+        progress_callback=lambda written, total: job.progress(written, total)
+    ))
+    return {
+        "message": "Schema loaded into ChromaDB successfully.",
+        "documents_added": summary["added"],
+        "documents_changed": summary["changed"],
+        "documents_removed": summary["removed"],
+        "documents_unchanged": summary["unchanged"],
+        "documents_total": summary["documents"]
+    }
 
-        current_app.logger.info(f"API: Successfully populated {num_docs_added} schema documents into ChromaDB.")
-        return jsonify({"message": "Schema loaded into ChromaDB successfully.", "documents_added": num_docs_added}), 200
+def _submit_job(kind, params, run):
+    # "wait": true (body) or ?wait=1 blocks until the job finishes and returns its final state.
+    # Routes that enqueue jobs are deliberately not @bounded: enqueueing is cheap, and a client
+    # waiting here must hold a request thread, never a serving pool worker that searches need.
+    payload = request.get_json(silent=True) or {}
+    wait = bool(payload.get("wait")) or request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    try:
+        job, coalesced = get_job_queue().submit(kind, params, run)
     except Exception as e:
-        current_app.logger.error(f"API: Error loading schema to ChromaDB: {e}", exc_info=True)
-        return jsonify({"error": "Failed to load schema to ChromaDB", "details": str(e)}), 500
+        current_app.logger.error(f"API: Error queueing {kind} job: {e}", exc_info=True)
+        return jsonify({"error": f"Failed to queue {kind} job", "details": str(e)}), 500
+    status_url = url_for('api.get_job', job_id=job.id)
+    if coalesced:
+        current_app.logger.info(f"API: {kind} request coalesced into queued job {job.id}.")
+    if wait:
+        job.wait()
+        return jsonify(job.to_dict()), 200 if job.state == SUCCEEDED else 500
+    return jsonify({"job_id": job.id, "status_url": status_url, "coalesced": coalesced, "job": job.to_dict()}), 202, {"Location": status_url}
+
+@api_bp.route('/jobs')
+def list_jobs():
+    queue = get_job_queue()
+    return jsonify({"jobs": [job.to_dict() for job in queue.list()], "stats": queue.get_stats()})
+
+@api_bp.route('/jobs/<string:job_id>')
+def get_job(job_id):
+    # State, progress (documents written, total when known), docs/s, result or error
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job.to_dict())
 
 @api_bp.route('/schema/search')
+@bounded()
 def search_schema_in_chroma():
     query_text = request.args.get('q')
     n_results = request.args.get('n_results', default=5, type=int)
+    expand_fk = request.args.get('expand_fk', '').lower() in ('1', 'true', 'yes')
 
     if not query_text:
         return jsonify({"error": "Query parameter 'q' is required."}), 400
 
+    # Optional metadata filters on top of the schema-only restriction
+    filters = {key: request.args[key] for key in ("type", "table_name") if request.args.get(key)}
+    where = {"source": "ddl_parser"} # This ensures we only search schema docs we added
+    if filters:
+        where = {"$and": [where] + [{key: value} for key, value in filters.items()]}
+
+    cache_key = (" ".join(query_text.split()).lower(), n_results, json.dumps(where, sort_keys=True))
+    version = get_collection_version() # Read before querying so a concurrent write leaves the entry stale
+    cached = _search_results_cache.get(cache_key, version=version)
+    if cached is not None:
+        formatted_results, served_by = cached
+        current_app.logger.info(f"API: Serving {len(formatted_results)} cached schema results for '{query_text}'.")
+        return jsonify(_schema_search_body(query_text, formatted_results, served_by, True, expand_fk))
+
     current_app.logger.info(f"API: Searching schema in ChromaDB for: '{query_text}', n_results={n_results}")
     try:
-        collection = get_particles_collection()
-        # We search for documents of type "table_schema" or "column_schema"
-        # This 'where' clause assumes metadatas were set up with 'type' and 'source'
-        results = collection.query(
-            query_texts=[query_text],
-            n_results=n_results,
-            where={"source": "ddl_parser"} # This ensures we only search schema docs we added
-        )
+        # Literal table/column names are answered from the lexical index without embedding the
+        # query; anything else fuses the BM25 and vector rankings with reciprocal rank fusion.
+        with stage("lexical"):
+            index = get_lexical_index()
+            exact_ids = index.exact_lookup(query_text, filters)
+            lexical_ranking = [] if exact_ids else index.search(query_text, max(n_results, SCHEMA_SEARCH_CANDIDATES), filters)
 
-        formatted_results = []
-        if results and results.get('ids') and results['ids'][0]:
-            for i in range(len(results['ids'][0])):
+        distances = {}
+        vector_bodies = {}
+        if exact_ids:
+            served_by = "exact"
+            page = [(doc_id, None) for doc_id in exact_ids[:n_results]]
+        else:
+            vector_n_results = max(n_results, SCHEMA_SEARCH_CANDIDATES) if lexical_ranking else n_results
+            # Small schemas are ranked exactly by the in-memory NumPy engine (see numpy_search.py)
+            from numpy_search import get_numpy_index
+            numpy_index = get_numpy_index()
+            if numpy_index is not None:
+                with stage("embed"):
+                    query_embeddings = get_embedding_function().embed_query([query_text])
+                with stage("vector_search"):
+                    ranking = numpy_index.search(query_embeddings, vector_n_results, filters)[0]
+                vector_ids = [doc_id for doc_id, _ in ranking]
+                distances = dict(ranking)
+                vector_bodies = numpy_index.get_documents(vector_ids)
+            else:
+                results = with_collection(lambda collection: collection.query(
+                    query_texts=[query_text],
+                    n_results=vector_n_results,
+                    where=where
+                ))
+                vector_ids = results['ids'][0] if results and results.get('ids') else []
+                for i, doc_id in enumerate(vector_ids):
+                    distances[doc_id] = results['distances'][0][i] if results['distances'] else None
+                    vector_bodies[doc_id] = (
+                        results['documents'][0][i] if results['documents'] else None,
+                        results['metadatas'][0][i] if results['metadatas'] else None
+                    )
+            if lexical_ranking:
+                served_by = "hybrid"
+                page = reciprocal_rank_fusion([vector_ids, [doc_id for doc_id, _ in lexical_ranking]])[:n_results]
+            else:
+                served_by = "vector"
+                page = [(doc_id, None) for doc_id in vector_ids[:n_results]]
+
+        with stage("serialize"):
+            lexical_bodies = index.get_documents([doc_id for doc_id, _ in page if doc_id not in vector_bodies])
+            formatted_results = []
+            for doc_id, score in page:
+                document, metadata = vector_bodies.get(doc_id) or lexical_bodies.get(doc_id, (None, None))
                 formatted_results.append({
-                    "id": results['ids'][0][i],
-                    "document": results['documents'][0][i] if results['documents'] else None,
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else None,
-                    "distance": results['distances'][0][i] if results['distances'] else None,
+                    "id": doc_id,
+                    "document": document,
+                    "metadata": metadata,
+                    "distance": distances.get(doc_id),
+                    "score": score,
                 })
+            _search_results_cache.set(cache_key, (formatted_results, served_by), version=version)
 
-        current_app.logger.info(f"API: Found {len(formatted_results)} schema results for '{query_text}'.")
-        return jsonify({
-            "query": query_text,
-            "results": formatted_results
-        })
+            current_app.logger.info(f"API: Found {len(formatted_results)} schema results for '{query_text}' ({served_by}).")
+            return jsonify(_schema_search_body(query_text, formatted_results, served_by, False, expand_fk))
     except Exception as e:
         current_app.logger.error(f"API: Error searching schema in ChromaDB: {e}", exc_info=True)
         return jsonify({"error": "Failed to search schema in ChromaDB", "details": str(e)}), 500
+
+def _schema_search_body(query_text, formatted_results, served_by, cached, expand_fk):
+    body = {"query": query_text, "results": formatted_results, "served_by": served_by, "cached": cached}
+    if expand_fk:
+        # FK-adjacent tables of every table in the results, from the precomputed graph
+        graph = get_schema_graph()
+        result_tables = dict.fromkeys(
+            (item["metadata"] or {}).get("table_name") for item in formatted_results if item["metadata"]
+        )
+        body["fk_expansion"] = {
+            table_name: graph.neighbors(table_name) for table_name in result_tables if table_name in graph.tables
+        }
+    return body
+
+
+@api_bp.route('/snapshots')
+def list_collection_snapshots():
+    from snapshot import list_snapshots
+    return jsonify({"snapshots": list_snapshots()})
+
+@api_bp.route('/snapshots', methods=['POST'])
+def create_collection_snapshot():
+    # Snapshots are always written under CHROMA_DATA_PATH/snapshots; clients only pick the name.
+    # Runs on the single-writer job queue so it never overlaps a load.
+    from snapshot import export_snapshot, default_snapshot_name, snapshot_path
+    payload = request.get_json(silent=True) or {}
+    name = payload.get("name") or default_snapshot_name()
+    try:
+        if os.path.exists(snapshot_path(name)):
+            return jsonify({"error": f"Snapshot '{name}' already exists"}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    current_app.logger.info(f"API: Queueing export of collection snapshot '{name}'...")
+
+    def run(job):
+        result = with_collection(lambda collection: export_snapshot(
+            name, collection=collection, progress_callback=lambda rows, total: job.progress(rows, total)
+        ))
+        return {"message": "Snapshot created.", **result}
+
+    return _submit_job("snapshot_export", {"name": name}, run)
+
+@api_bp.route('/snapshots/<string:name>/import', methods=['POST'])
+def import_collection_snapshot(name):
+    from snapshot import import_snapshot, snapshot_path
+    payload = request.get_json(silent=True) or {}
+    replace = bool(payload.get("replace"))
+    try:
+        if not os.path.exists(os.path.join(snapshot_path(name), "manifest.json")):
+            return jsonify({"error": f"Snapshot '{name}' not found."}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    current_app.logger.info(f"API: Queueing import of collection snapshot '{name}' (replace={replace})...")
+
+    def run(job):
+        result = import_snapshot(name, replace=replace, progress_callback=lambda rows, total: job.progress(rows, total))
+        return {"message": "Snapshot imported.", **result}
+
+    return _submit_job("snapshot_import", {"name": name, "replace": replace}, run)
+
+
+@api_bp.route('/data/load_from_sqlite', methods=['POST'])
+def load_rows_from_sqlite():
+    # Rows are always read from the configured SQLITE_SOURCE_PATH; clients only pick tables.
+    from ingest import ingest_sqlite_rows, reset_checkpoints, SQLITE_SOURCE_PATH
+    payload = request.get_json(silent=True) or {}
+    tables = payload.get("tables")
+    if tables is not None and not (isinstance(tables, list) and all(isinstance(t, str) for t in tables)):
+        return jsonify({"error": "'tables' must be a list of table names."}), 400
+    if not os.path.exists(SQLITE_SOURCE_PATH):
+        return jsonify({"error": f"SQLite source '{SQLITE_SOURCE_PATH}' not found."}), 404
+
+    unknown = [table_name for table_name in tables or () if table_name not in get_parsed_schema()]
+    if unknown:
+        return jsonify({"error": f"Table(s) not found in schema: {', '.join(unknown)}"}), 400
+
+    current_app.logger.info(f"API: Queueing row ingest from {SQLITE_SOURCE_PATH} (tables={tables or 'all'})...")
+    restart = bool(payload.get("restart"))
+
+    def run(job):
+        if restart:
+            reset_checkpoints(tables)
+        summary = with_collection(lambda collection: ingest_sqlite_rows(
+            SQLITE_SOURCE_PATH, tables=tables, collection=collection, parsed_schemas=get_parsed_schema(),
+            progress_callback=lambda table_name, rows: job.progress(rows, detail=table_name)
+        ))
+        return {"message": "Rows loaded into ChromaDB successfully.", **summary}
+
+    return _submit_job("sqlite_load", {"tables": tables, "restart": restart}, run)
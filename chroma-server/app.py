@@ -1,6 +1,10 @@
 from flask import Flask, render_template
 from api import api_bp
+from chroma_utils import warm_up_chroma, get_pool_stats, start_background_warm_up
+from metadata_index import get_metadata_index
+from lexical_index import get_lexical_index
 import logging
+import os
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO)
@@ -8,6 +12,30 @@ logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 app.register_blueprint(api_bp)
 
+# Open the shared Chroma client/collection and load the embedding model once at startup, so the
+# first API request does not pay for it. "background" (default) does this on a thread while the
+# app already serves routes that do not touch the vector store (/api/status reports readiness),
+# "sync" blocks startup until it is done, "off" leaves everything to the first vector request.
+CHROMA_WARM_UP = os.environ.get("CHROMA_WARM_UP", "background").lower()
+
+def _build_numpy_index():
+    # Imported here so numpy only loads once Chroma (which needs it anyway) is warming up
+    from numpy_search import get_numpy_index
+    return get_numpy_index()
+
+if CHROMA_WARM_UP == "sync":
+    try:
+        warm_up_chroma()
+        app.logger.info(f"ChromaDB warm-up complete in {get_pool_stats()['warm_up_seconds']:.2f}s.")
+        app.logger.info(f"Metadata index built: {get_metadata_index().get_stats()}")
+        app.logger.info(f"Lexical index built: {get_lexical_index().get_stats()}")
+        numpy_index = _build_numpy_index()
+        app.logger.info(f"NumPy search index: {numpy_index.get_stats() if numpy_index is not None else 'disabled'}")
+    except Exception as e:
+        app.logger.warning(f"ChromaDB warm-up failed, continuing with lazy initialization: {e}")
+elif CHROMA_WARM_UP == "background":
+    start_background_warm_up(get_metadata_index, get_lexical_index, _build_numpy_index)
+
 @app.route('/')
 def index():
     app.logger.info("Serving index page.")
@@ -0,0 +1,307 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+COLUMN_TYPES = ("INTEGER", "VARCHAR", "VARCHAR(64)", "FLOAT", "BOOLEAN", "TEXT", "DATE", "DOUBLE")
+NAME_WORDS = (
+    "particle", "mass", "width", "decay", "mode", "branching", "ratio", "lifetime", "charge", "spin",
+    "parity", "isospin", "quark", "lepton", "meson", "baryon", "value", "error", "limit", "unit",
+    "reference", "footnote", "year", "source", "target", "status", "flag", "code", "label", "sort",
+)
+SEARCH_QUERIES = (
+    "particle mass", "decay width of the meson", "branching ratio", "mean lifetime", "reference year",
+    "primary key of pdgid", "foreign key to pdgitem", "unique constraint on name", "footnote text",
+    "upper limit value", "error on the measured value", "quark content", "charge conjugation parity",
+    "table with decay modes", "column storing the doi", "isospin and spin", "measurement unit",
+    "inspire identifier", "sort order column", "boolean flag column",
+)
+
+
+def synthetic_ddl(table_count, seed=0):
+    # Deterministic CREATE TABLE statements shaped like the bundled PDG schema: 4-16 columns,
+    # an id primary key, NOT NULL/UNIQUE/DEFAULT/CHECK clauses and foreign keys to earlier tables.
+    rng = random.Random(seed)
+    statements = []
+    for t in range(table_count):
+        table_name = f"{rng.choice(NAME_WORDS)}_{rng.choice(NAME_WORDS)}_{t}"
+        columns = ["id INTEGER NOT NULL"]
+        constraints = ["PRIMARY KEY (id)"]
+        for c in range(rng.randint(3, 15)):
+            column_name = f"{rng.choice(NAME_WORDS)}_{c}"
+            column = f"{column_name} {rng.choice(COLUMN_TYPES)}"
+            roll = rng.random()
+            if roll < 0.3:
+                column += " NOT NULL"
+            elif roll < 0.4:
+                column += f" DEFAULT {rng.randint(0, 9)}"
+            elif roll < 0.45:
+                column += f" CHECK ({column_name} >= 0)"
+            columns.append(column)
+            if roll > 0.95:
+                constraints.append(f"UNIQUE ({column_name})")
+        if t and rng.random() < 0.5:
+            target = statements[rng.randrange(t)].split()[2]
+            columns.append(f"{target}_id INTEGER")
+            constraints.append(f"FOREIGN KEY({target}_id) REFERENCES {target} (id)")
+        statements.append(f"CREATE TABLE {table_name} ({', '.join(columns + constraints)})")
+    return statements
+
+
+def percentiles(samples_ms):
+    values = np.asarray(samples_ms)
+    return {
+        "requests": len(samples_ms),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def reset_collection():
+    import chroma_utils
+    try:
+        chroma_utils.delete_collection()
+    except Exception as e:
+        if not chroma_utils.is_missing_collection_error(e):
+            raise
+
+
+def bench_parse(table_counts, seed):
+    import chroma_utils
+    results = []
+    for table_count in table_counts:
+        statements = synthetic_ddl(table_count, seed)
+        chroma_utils._parsed_statement_memo.clear()
+        started = time.perf_counter()
+        parsed = chroma_utils.parse_ddl_statements(statements)
+        cold_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        chroma_utils.parse_ddl_statements(statements)
+        warm_seconds = time.perf_counter() - started
+        results.append({
+            "tables": table_count,
+            "columns": sum(len(info["columns"]) for info in parsed.values()),
+            "ddl_bytes": sum(len(stmt) for stmt in statements),
+            "cold_seconds": cold_seconds,
+            "warm_seconds": warm_seconds,
+            "tables_per_second": table_count / cold_seconds if cold_seconds else 0.0,
+        })
+        print(f"parse {table_count} tables: {cold_seconds:.3f}s cold, {warm_seconds:.4f}s warm", file=sys.stderr)
+    return results
+
+
+def bench_populate(table_counts, seed):
+    import chroma_utils
+    results = []
+    for table_count in table_counts:
+        reset_collection()
+        parsed = chroma_utils.parse_ddl_statements(synthetic_ddl(table_count, seed))
+        started = time.perf_counter()
+        summary = chroma_utils.with_collection(
+            lambda collection: chroma_utils.populate_schema_in_chromadb(collection=collection, parsed_schemas=parsed)
+        )
+        seconds = time.perf_counter() - started
+        # A second sync with nothing changed measures the content-hash diff path alone
+        started = time.perf_counter()
+        chroma_utils.with_collection(
+            lambda collection: chroma_utils.populate_schema_in_chromadb(collection=collection, parsed_schemas=parsed)
+        )
+        resync_seconds = time.perf_counter() - started
+        results.append({
+            "tables": table_count,
+            "documents": summary["documents"],
+            "seconds": seconds,
+            "docs_per_second": summary["documents"] / seconds if seconds else 0.0,
+            "resync_seconds": resync_seconds,
+        })
+        print(f"populate {table_count} tables: {summary['documents']} docs in {seconds:.2f}s "
+              f"({results[-1]['docs_per_second']:.0f} docs/s), resync {resync_seconds:.2f}s", file=sys.stderr)
+    reset_collection()
+    return results
+
+
+def load_synthetic_documents(collection, size, dim, seed):
+    # Bulk-load schema-shaped documents with precomputed random unit vectors, so collections of
+    # 100k-1M documents can be built without running the embedding model over every document.
+    import chroma_utils
+    rng = np.random.default_rng(seed)
+    batch_size = min(5000, chroma_utils.get_chroma_client().get_max_batch_size())
+    for batch_start in range(0, size, batch_size):
+        batch_end = min(size, batch_start + batch_size)
+        vectors = rng.standard_normal((batch_end - batch_start, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids, documents, metadatas = [], [], []
+        for i in range(batch_start, batch_end):
+            table_name = f"{NAME_WORDS[i % len(NAME_WORDS)]}_{i // 16}"
+            column_name = f"{NAME_WORDS[(i * 7) % len(NAME_WORDS)]}_{i % 16}"
+            ids.append(f"col_schema_{table_name}_{column_name}")
+            documents.append(f"Column: {column_name} in table {table_name}. Type: {COLUMN_TYPES[i % len(COLUMN_TYPES)]}.")
+            metadatas.append({
+                "type": "column_schema", "table_name": table_name, "column_name": column_name, "source": "ddl_parser"
+            })
+        collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+    # Indexes and caches built on the collection are rebuilt lazily instead of replaying every batch
+    chroma_utils.record_collection_write(collection.name, reset=True)
+
+
+def bench_search(sizes, requests_per_size, n_results, seed):
+    import chroma_utils
+    from app import app
+    from api import endpoints
+
+    client = app.test_client()
+    dim = len(chroma_utils.get_embedding_function()(["dimension probe"])[0])
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        reset_collection()
+        started = time.perf_counter()
+        chroma_utils.with_collection(lambda collection: load_synthetic_documents(collection, size, dim, seed))
+        load_seconds = time.perf_counter() - started
+
+        queries = [rng.choice(SEARCH_QUERIES) for _ in range(requests_per_size)]
+        # Warm-up pass: loads the HNSW index and fills the query embedding cache
+        for query in SEARCH_QUERIES:
+            client.get("/api/schema/search", query_string={"q": query, "n_results": n_results})
+
+        timings = {"uncached": [], "cached": []}
+        for mode in ("uncached", "cached"):
+            for query in queries:
+                if mode == "uncached":
+                    endpoints._search_results_cache.clear()
+                started = time.perf_counter()
+                response = client.get("/api/schema/search", query_string={"q": query, "n_results": n_results})
+                timings[mode].append((time.perf_counter() - started) * 1000.0)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/api/schema/search returned {response.status_code}: {response.get_data(as_text=True)}")
+        results.append({
+            "collection_size": size,
+            "load_seconds": load_seconds,
+            "uncached": percentiles(timings["uncached"]),
+            "cached": percentiles(timings["cached"]),
+        })
+        print(f"search {size} docs: p50 {results[-1]['uncached']['p50_ms']:.2f}ms, "
+              f"p95 {results[-1]['uncached']['p95_ms']:.2f}ms, p99 {results[-1]['uncached']['p99_ms']:.2f}ms "
+              f"(cached p50 {results[-1]['cached']['p50_ms']:.3f}ms)", file=sys.stderr)
+    reset_collection()
+    return results
+
+
+def flatten_metrics(results):
+    # {(section, size, metric): value} for the metrics compared against the baseline
+    metrics = {}
+    for entry in results.get("parse", []):
+        metrics[("parse", entry["tables"], "cold_seconds")] = entry["cold_seconds"]
+    for entry in results.get("populate", []):
+        metrics[("populate", entry["tables"], "docs_per_second")] = entry["docs_per_second"]
+        metrics[("populate", entry["tables"], "resync_seconds")] = entry["resync_seconds"]
+    for entry in results.get("search", []):
+        for percentile in ("p50_ms", "p95_ms", "p99_ms"):
+            metrics[("search", entry["collection_size"], percentile)] = entry["uncached"][percentile]
+    return metrics
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    # A metric regresses when it is worse than the baseline by more than `tolerance` (a fraction).
+    # Throughput metrics (*_per_second) are better when higher, everything else when lower.
+    current = flatten_metrics(results)
+    comparison = []
+    for key, baseline_value in flatten_metrics(baseline).items():
+        if key not in current or not baseline_value:
+            continue
+        section, size, metric = key
+        change = (current[key] - baseline_value) / baseline_value
+        worse = -change if metric.endswith("_per_second") else change
+        comparison.append({
+            "section": section, "size": size, "metric": metric,
+            "baseline": baseline_value, "current": current[key],
+            "change": change, "regression": worse > tolerance,
+        })
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DDL parsing, schema population and schema search.")
+    parser.add_argument("--parse-tables", type=int, nargs="*", default=[10, 100, 1000, 10000])
+    parser.add_argument("--populate-tables", type=int, nargs="*", default=[10, 100, 1000])
+    parser.add_argument("--search-sizes", type=int, nargs="*", default=[1000, 100000, 1000000])
+    parser.add_argument("--search-requests", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before failing (fraction)")
+    parser.add_argument("--keep-data", action="store_true", help="Do not delete the temporary CHROMA_DATA_PATH")
+    args = parser.parse_args()
+
+    # chroma_utils reads CHROMA_DATA_PATH at import time, so it must be set before any import.
+    # Importing app would otherwise start the background warm-up, which races the collection
+    # resets and synthetic loads below and skews the cold-path numbers.
+    data_path = tempfile.mkdtemp(prefix="chroma_bench_")
+    os.environ["CHROMA_DATA_PATH"] = data_path
+    os.environ["CHROMA_WARM_UP"] = "off"
+    sys.path.insert(0, SERVER_DIR)
+    import chromadb
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "chromadb": chromadb.__version__,
+            "chroma_data_path": data_path,
+            "args": vars(args),
+        }
+    }
+    try:
+        if args.parse_tables:
+            results["parse"] = bench_parse(args.parse_tables, args.seed)
+        if args.populate_tables:
+            results["populate"] = bench_populate(args.populate_tables, args.seed)
+        if args.search_sizes:
+            results["search"] = bench_search(args.search_sizes, args.search_requests, args.n_results, args.seed)
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(data_path, ignore_errors=True)
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare_to_baseline(results, json.load(f), args.tolerance)
+        for row in results["comparison"]:
+            marker = "REGRESSION" if row["regression"] else "ok"
+            print(f"{marker:>10}  {row['section']:<8} {row['size']:>8} {row['metric']:<16} "
+                  f"{row['baseline']:.4g} -> {row['current']:.4g} ({row['change']:+.1%})", file=sys.stderr)
+        if any(row["regression"] for row in results["comparison"]):
+            exit_code = 1
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(output)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
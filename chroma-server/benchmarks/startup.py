@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter per measurement so import caches do not carry over
+CHILD_SCRIPT = r"""
+import json, os, sys, time
+started = time.perf_counter()
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    except ImportError:
+        return None
+
+sys.path.insert(0, os.getcwd())
+import app
+import_seconds = time.perf_counter() - started
+client = app.app.test_client()
+status = client.get("/api/status")
+first_response_seconds = time.perf_counter() - started
+result = {
+    "import_seconds": import_seconds,
+    "first_status_seconds": first_response_seconds,
+    "status_code": status.status_code,
+    "chromadb_imported_at_first_response": "chromadb" in sys.modules,
+    "rss_mb_at_first_response": rss_mb(),
+}
+deadline = time.perf_counter() + float(os.environ["STARTUP_READY_TIMEOUT"])
+while client.get("/api/ready").status_code != 200 and time.perf_counter() < deadline:
+    time.sleep(0.01)
+readiness = client.get("/api/ready").get_json()
+result.update({
+    "ready_seconds": time.perf_counter() - started if readiness["ready"] else None,
+    "readiness_state": readiness["state"],
+    "rss_mb_when_ready": rss_mb(),
+})
+print(json.dumps(result))
+"""
+
+
+def measure(mode, data_path, ready_timeout):
+    env = dict(os.environ, CHROMA_WARM_UP=mode, CHROMA_DATA_PATH=data_path, STARTUP_READY_TIMEOUT=str(ready_timeout))
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT], cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker cold-start time and memory for each warm-up mode.")
+    parser.add_argument("--modes", nargs="*", default=["sync", "background", "off"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--data-path", help="CHROMA_DATA_PATH to start against (default: a fresh temporary directory)")
+    args = parser.parse_args()
+
+    data_path = args.data_path or tempfile.mkdtemp(prefix="chroma_startup_")
+    results = {"chroma_data_path": data_path, "modes": {}}
+    for mode in args.modes:
+        runs = [measure(mode, data_path, args.ready_timeout) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["first_status_seconds"])
+        results["modes"][mode] = {"runs": runs, "best": best}
+        print(f"{mode:>10}: first /api/status after {best['first_status_seconds']:.2f}s "
+              f"({best['rss_mb_at_first_response'] or 0:.0f} MB), ready after "
+              f"{best['ready_seconds'] if best['ready_seconds'] is not None else float('nan'):.2f}s "
+              f"({best['rss_mb_when_ready'] or 0:.0f} MB)", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
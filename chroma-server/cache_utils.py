@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    # Small thread-safe LRU cache with a per-entry TTL.
+    # Entries can be tagged with a version (e.g. a collection write counter); an entry whose
+    # version no longer matches the caller's current version is dropped instead of served.
+
+    def __init__(self, max_entries=256, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, version, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, version=None, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats["misses"] += 1
+                return default
+            expires_at, entry_version, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            if entry_version != version:
+                del self._entries[key]
+                self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+            if entry is _MISSING:
+                return None
+            self._stats["invalidations"] += 1
+            return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -1,10 +1,25 @@
-import chromadb
+import hashlib
 import os
 import re
+import sqlite3
+import threading
+import time
 import json # For the test block
+import logging
 
-CHROMA_DATA_PATH = "chroma_data"
+from cache_utils import LRUTTLCache
+from metrics import InstrumentedCollection, METRICS_ENABLED
+
+CHROMA_DATA_PATH = os.environ.get("CHROMA_DATA_PATH", "chroma_data")
 COLLECTION_NAME = "particles"
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "1") != "0"
+SCHEMA_WRITE_BATCH_SIZE = 1000
+# Optional SQLite file whose sqlite_master provides the DDL instead of ALL_DDL_STATEMENTS
+DDL_SOURCE_SQLITE_PATH = os.environ.get("DDL_SOURCE_SQLITE_PATH")
+# Distinct CREATE TABLE statements kept parsed; the least recently used are dropped first
+DDL_PARSE_MEMO_SIZE = int(os.environ.get("DDL_PARSE_MEMO_SIZE", 16384))
+
+logger = logging.getLogger(__name__)
 
 # IMPORTANT: CREATE INDEX statements are NOT included here as the parser only processes CREATE TABLE.
 # The DDLs are taken directly from the issue description's CREATE TABLE statements.
@@ -28,144 +43,579 @@ ALL_DDL_STATEMENTS = [
 ]
 
 
+# Process-wide client and collection handle registry.
+# PersistentClient is thread-safe and opening it is expensive (SQLite connections, segment
+# managers), so every request shares one client and one handle per collection.
+_registry_lock = threading.RLock()
+_client = None
+_embedding_function = None
+_base_embedding_function = None
+_collection_handles = {}
+_pool_stats = {
+    "client_init_seconds": None,
+    "client_created_at": None,
+    "client_requests": 0,
+    "collection_requests": 0,
+    "collection_handle_creations": 0,
+    "collection_handle_reuses": 0,
+    "collection_handle_invalidations": 0,
+    "collection_init_seconds": {},
+    "warm_up_seconds": None,
+    "warm_up_error": None,
+}
+
+
+# Per-collection write counter. Every write path bumps it so caches keyed on query results
+# (see api/endpoints.py) can tell when their entries are stale.
+_collection_versions = {}
+
+
+def get_collection_version(name=COLLECTION_NAME):
+    return _collection_versions.get(name, 0)
+
+def bump_collection_version(name=COLLECTION_NAME):
+    with _registry_lock:
+        _collection_versions[name] = _collection_versions.get(name, 0) + 1
+        return _collection_versions[name]
+
+# In-process indexes kept in sync with the collection (e.g. metadata_index.py) register here.
+# Listeners are called as listener(collection_name, upserted, deleted_ids, reset) where upserted
+# is a dict with "ids", "metadatas" and optionally "documents"/"embeddings", and reset=True
+# means the collection content is unknown (deleted or recreated) and must be reloaded.
+_write_listeners = []
+
+
+def register_write_listener(listener):
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+def record_collection_write(name=COLLECTION_NAME, upserted=None, deleted_ids=None, reset=False):
+    # Every write path calls this after writing: bumps the version and notifies listeners.
+    version = bump_collection_version(name)
+    for listener in list(_write_listeners):
+        try:
+            listener(name, upserted, deleted_ids, reset)
+        except Exception:
+            logger.exception(f"Write listener {listener!r} failed for collection '{name}'")
+    return version
+
+
+def _bump_pool_stat(key, amount=1):
+    with _registry_lock:
+        _pool_stats[key] += amount
+
+
 def get_chroma_client():
-    # Ensure the chroma_data directory exists
-    if not os.path.exists(CHROMA_DATA_PATH):
-        os.makedirs(CHROMA_DATA_PATH)
-        # print(f"Created directory: {CHROMA_DATA_PATH}") # Debug: uncomment for logs
-    # else:
-        # print(f"Directory already exists: {CHROMA_DATA_PATH}") # Debug: uncomment for logs
-
-    client = chromadb.PersistentClient(path=CHROMA_DATA_PATH)
+    global _client
+    client = _client
+    if client is None:
+        with _registry_lock:
+            if _client is None:
+                started = time.perf_counter()
+                # Ensure the chroma_data directory exists
+                os.makedirs(CHROMA_DATA_PATH, exist_ok=True)
+                # Imported on first use: chromadb pulls in onnxruntime, numpy and telemetry, which
+                # routes that never touch the vector store should not pay for at startup.
+                import chromadb
+                _client = chromadb.PersistentClient(path=CHROMA_DATA_PATH)
+                _pool_stats["client_init_seconds"] = time.perf_counter() - started
+                _pool_stats["client_created_at"] = time.time()
+            client = _client
+    _bump_pool_stat("client_requests")
     return client
 
+def get_embedding_function(use_cache=True):
+    # Shared embedding function instance so the model is loaded once per process.
+    # Unless disabled, it is wrapped in the on-disk embedding cache (see embedding_cache.py)
+    # so documents and queries that were embedded before skip model inference.
+    # use_cache=False returns the bare model, for bulk text that is unlikely to repeat.
+    global _embedding_function, _base_embedding_function
+    if _embedding_function is None:
+        with _registry_lock:
+            if _embedding_function is None:
+                from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+                embedding_function = _base_embedding_function = DefaultEmbeddingFunction()
+                if EMBEDDING_CACHE_ENABLED:
+                    from embedding_cache import CachedEmbeddingFunction, EmbeddingStore, EMBEDDING_CACHE_DIRNAME
+                    store = EmbeddingStore(os.path.join(CHROMA_DATA_PATH, EMBEDDING_CACHE_DIRNAME))
+                    embedding_function = CachedEmbeddingFunction(embedding_function, store)
+                _embedding_function = embedding_function
+    return _embedding_function if use_cache else _base_embedding_function
+
+def get_embedding_cache_stats():
+    embedding_function = _embedding_function
+    if embedding_function is None or not hasattr(embedding_function, "get_stats"):
+        return {"enabled": EMBEDDING_CACHE_ENABLED, "loaded": False}
+    stats = embedding_function.get_stats()
+    stats.update({"enabled": True, "loaded": True})
+    return stats
+
+def get_collection(name=COLLECTION_NAME, metadata=None, configuration=None):
+    # metadata/configuration are only applied when the collection is created by this call
+    if name == COLLECTION_NAME:
+        # With CHROMA_SHARDING enabled the main collection is a view over per-table shards
+        from sharding import sharding_enabled, get_sharded_collection
+        if sharding_enabled():
+            return get_sharded_collection()
+    _bump_pool_stat("collection_requests")
+    collection = _collection_handles.get(name)
+    if collection is not None:
+        _bump_pool_stat("collection_handle_reuses")
+        return collection
+
+    with _registry_lock:
+        collection = _collection_handles.get(name)
+        if collection is None:
+            started = time.perf_counter()
+            collection = get_chroma_client().get_or_create_collection(
+                name=name, embedding_function=get_embedding_function(), metadata=metadata, configuration=configuration
+            )
+            if METRICS_ENABLED:
+                collection = InstrumentedCollection(collection, get_embedding_function())
+            _collection_handles[name] = collection
+            _pool_stats["collection_handle_creations"] += 1
+            _pool_stats["collection_init_seconds"][name] = time.perf_counter() - started
+        else:
+            _pool_stats["collection_handle_reuses"] += 1
+    return collection
+
+def get_collection_space(collection):
+    # Distance function of the collection's HNSW index ("l2", "cosine" or "ip")
+    configuration = getattr(collection, "configuration", None) or {}
+    space = (configuration.get("hnsw") or {}).get("space") or (collection.metadata or {}).get("hnsw:space")
+    return space if space in ("l2", "cosine", "ip") else "l2"
+
+def invalidate_collection(name=None):
+    # Drop cached handle(s); the next get_collection() call re-resolves them from the client.
+    with _registry_lock:
+        names = [name] if name is not None else list(_collection_handles)
+        for handle_name in names:
+            if _collection_handles.pop(handle_name, None) is not None:
+                _pool_stats["collection_handle_invalidations"] += 1
+
+def is_missing_collection_error(error):
+    # chromadb raises NotFoundError (1.x) or InvalidCollectionException (0.x) for stale handles.
+    error_types = {cls.__name__ for cls in type(error).__mro__}
+    if error_types & {"NotFoundError", "InvalidCollectionException"}:
+        return True
+    return "does not exist" in str(error).lower()
+
+def with_collection(operation, name=COLLECTION_NAME):
+    # Run operation(collection) with the shared handle. If the collection was deleted or
+    # recreated behind our back, refresh the handle once and retry.
+    collection = get_collection(name)
+    try:
+        return operation(collection)
+    except Exception as e:
+        if not is_missing_collection_error(e):
+            raise
+        invalidate_collection(name)
+        record_collection_write(name, reset=True)
+        return operation(get_collection(name))
+
+def delete_collection(name=COLLECTION_NAME):
+    from sharding import sharding_enabled, delete_shards
+    if name == COLLECTION_NAME and sharding_enabled():
+        delete_shards()
+    else:
+        get_chroma_client().delete_collection(name=name)
+    invalidate_collection(name)
+    record_collection_write(name, reset=True)
+
 def get_particles_collection(client=None):
     if client is None:
-        client = get_chroma_client()
+        return get_collection(COLLECTION_NAME)
     collection = client.get_or_create_collection(name=COLLECTION_NAME)
     return collection
 
-def parse_ddl_statements(ddl_statements: list[str]) -> dict:
-    parsed_schemas = {}
-    table_name_re = re.compile(r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?\"?(\w+)\"?\s*\(", re.IGNORECASE)
-
-    for stmt_idx, stmt in enumerate(ddl_statements):
-        table_match = table_name_re.search(stmt)
-        if not table_match:
-            continue
-
-        table_name = table_match.group(1).replace('"', '')
-        parsed_schemas[table_name] = {"columns": [], "primary_key": [], "foreign_keys": [], "unique_constraints": [], "check_constraints": []}
-
-        body_match = re.search(r"\((.*)\)", stmt, re.DOTALL | re.IGNORECASE)
-        if not body_match:
-            continue
-
-        body = body_match.group(1).strip()
-
-        definitions = []
-        balance = 0
-        current_def = ""
-        # Iterate char by char to correctly split definitions by comma, respecting parentheses.
-        for char_idx, char in enumerate(body):
-            if char == '(':
-                balance += 1
-            elif char == ')':
-                balance -= 1
-
-            if char == ',' and balance == 0: # Split point
-                definitions.append(current_def.strip())
-                current_def = ""
+def warm_up_chroma(name=COLLECTION_NAME):
+    # Open the client and collection, load the embedding model and touch the HNSW segment
+    # so the first real query does not pay for it.
+    started = time.perf_counter()
+    try:
+        collection = get_collection(name)
+        query_embeddings = get_embedding_function().embed_query(["warm-up"])
+        if collection.count() > 0:
+            collection.query(query_embeddings=query_embeddings, n_results=1, include=[])
+        _pool_stats["warm_up_error"] = None
+    except Exception as e:
+        _pool_stats["warm_up_error"] = str(e)
+        raise
+    finally:
+        _pool_stats["warm_up_seconds"] = time.perf_counter() - started
+
+_readiness = {"state": "lazy", "error": None, "seconds": None}
+
+def start_background_warm_up(*extra_steps, name=COLLECTION_NAME):
+    # Run warm_up_chroma (plus any extra steps, e.g. building in-process indexes) on a daemon
+    # thread so the process can serve non-vector routes while chromadb and the model load.
+    def run():
+        started = time.perf_counter()
+        _readiness.update(state="warming", error=None)
+        try:
+            warm_up_chroma(name)
+            for step in extra_steps:
+                step()
+            _readiness["state"] = "ready"
+            logger.info(f"Background warm-up complete in {time.perf_counter() - started:.2f}s.")
+        except Exception as e:
+            _readiness.update(state="failed", error=str(e))
+            logger.warning(f"Background warm-up failed, continuing with lazy initialization: {e}")
+        finally:
+            _readiness["seconds"] = time.perf_counter() - started
+
+    thread = threading.Thread(target=run, name="chroma-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def get_readiness():
+    # "lazy" means no warm-up was requested and the first vector request initializes Chroma.
+    readiness = dict(_readiness)
+    readiness["ready"] = readiness["state"] in ("lazy", "ready")
+    return readiness
+
+def get_pool_stats():
+    with _registry_lock:
+        stats = dict(_pool_stats)
+        stats["collection_init_seconds"] = dict(_pool_stats["collection_init_seconds"])
+        stats["cached_collections"] = sorted(_collection_handles)
+    return stats
+
+# DDL parsing patterns, compiled once.
+# Plain column definitions ("name TYPE(n) NOT NULL ...") are consumed by one _SIMPLE_COLUMN_RE
+# match each. Any other definition is delimited with _DDL_STRUCTURE_RE, which only stops at
+# parentheses and commas and skips quoted identifiers, strings and comments, and is then
+# tokenized with _DDL_TOKEN_RE. The input is scanned left to right once, so parsing is linear.
+_DDL_IDENT = r'"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\]|\w+'
+_DDL_COLUMN_KEYWORD = r"(?:CONSTRAINT|PRIMARY|NOT|NULL|UNIQUE|CHECK|DEFAULT|COLLATE|REFERENCES|GENERATED|AS)\b"
+_CREATE_TABLE_RE = re.compile(
+    r"\s*CREATE\s+(?:TEMP(?:ORARY)?\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    rf"(?:(?:{_DDL_IDENT})\s*\.\s*)?({_DDL_IDENT})\s*\(",
+    re.IGNORECASE
+)
+_DDL_STRUCTURE_RE = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/"""
+    r"""|\([^()'"`\[\-/]*\)|[(),]""",  # a flat "(...)" such as a type size is skipped whole
+    re.DOTALL
+)
+_LEADING_COMMENTS_RE = re.compile(r"(?:--[^\n]*|/\*.*?\*/|\s+)+", re.DOTALL)
+_TABLE_CONSTRAINT_RE = re.compile(r"(?:CONSTRAINT|PRIMARY|UNIQUE|CHECK|FOREIGN)\b", re.IGNORECASE)
+_SIMPLE_COLUMN_RE = re.compile(
+    r"\s*(?!(?:CONSTRAINT|PRIMARY|UNIQUE|CHECK|FOREIGN)\b)"
+    rf"({_DDL_IDENT})\s+"                                                    # Column name (group 1)
+    rf"((?!{_DDL_COLUMN_KEYWORD})\w+(?:\s+(?!{_DDL_COLUMN_KEYWORD})\w+)*"  # Type words (group 2)
+    r"(?:\s*\(\s*[+-]?\d+\s*(?:,\s*[+-]?\d+\s*)?\))?)"                # Optional size/precision
+    r"(\s+NOT\s+NULL)?"                                                    # NOT NULL (group 3)
+    r"(\s+UNIQUE)?"                                                         # UNIQUE (group 4)
+    r"(\s+PRIMARY\s+KEY)?"                                                 # PRIMARY KEY (group 5)
+    r"(?:\s+DEFAULT\s+([+-]?\d+(?:\.\d+)?|'(?:[^']|'')*'|\w+))?"           # Literal DEFAULT (group 6)
+    r"\s*([,)])",                                                           # End of definition (group 7)
+    re.IGNORECASE
+)
+_DDL_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<ident>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<word>\w+)
+  | (?P<punct>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Keywords that end a column's type and start its inline constraints
+_COLUMN_CONSTRAINT_KEYWORDS = frozenset({
+    "CONSTRAINT", "PRIMARY", "NOT", "NULL", "UNIQUE", "CHECK", "DEFAULT", "COLLATE",
+    "REFERENCES", "GENERATED", "AS",
+})
+
+# Parsed result per statement, keyed by the statement's hash. Parsed table dicts are shared
+# between calls and must be treated as read-only. Bounded, since every edited statement (e.g. a
+# DDL_SOURCE_SQLITE_PATH file that keeps changing) adds a new key.
+_parsed_statement_memo = LRUTTLCache(max_entries=DDL_PARSE_MEMO_SIZE, ttl_seconds=float("inf"))
+
+
+def _tokenize_ddl(stmt):
+    # List of (kind, text, start, end); whitespace and comments are dropped.
+    return [
+        (match.lastgroup, match.group(), match.start(), match.end())
+        for match in _DDL_TOKEN_RE.finditer(stmt)
+        if match.lastgroup != "space"
+    ]
+
+def _unquote_identifier(text):
+    if text[:1] == '"':
+        return text[1:-1].replace('""', '"')
+    if text[:1] == "`":
+        return text[1:-1].replace("``", "`")
+    if text[:1] == "[":
+        return text[1:-1]
+    return text
+
+def _matching_paren(tokens, open_idx):
+    # Index of the ")" closing the "(" at open_idx (or len(tokens) if unbalanced).
+    depth = 0
+    for idx in range(open_idx, len(tokens)):
+        text = tokens[idx][1]
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+            if depth == 0:
+                return idx
+    return len(tokens)
+
+def _identifier_list(tokens):
+    # Column names from the tokens of a "(a, b DESC, ...)" list, without ordering/collation terms.
+    names = []
+    expect_name = True
+    for kind, text, _, _ in tokens:
+        if text == ",":
+            expect_name = True
+        elif expect_name and kind in ("ident", "word"):
+            names.append(_unquote_identifier(text))
+            expect_name = False
+    return names
+
+def _parse_column_definition(stmt, tokens, table_schema):
+    col_name = _unquote_identifier(tokens[0][1])
+    idx = 1
+    type_start = type_end = None
+    while idx < len(tokens):
+        kind, text, start, end = tokens[idx]
+        if kind in ("word", "ident") and text.upper() not in _COLUMN_CONSTRAINT_KEYWORDS:
+            type_start = start if type_start is None else type_start
+            type_end = end
+            idx += 1
+        elif text == "(" and type_start is not None:
+            close_idx = _matching_paren(tokens, idx)
+            type_end = tokens[min(close_idx, len(tokens) - 1)][3]
+            idx = close_idx + 1
+        else:
+            break
+
+    col_info = {"name": col_name, "type": stmt[type_start:type_end] if type_start is not None else ""}
+    extras = {}
+    while idx < len(tokens):
+        keyword = tokens[idx][1].upper()
+        next_keyword = tokens[idx + 1][1].upper() if idx + 1 < len(tokens) else ""
+        if keyword == "NOT" and next_keyword == "NULL":
+            col_info["not_null"] = True
+            idx += 2
+        elif keyword == "PRIMARY" and next_keyword == "KEY":
+            col_info["primary_key_inline"] = True # Mark that this column is part of PK, potentially composite
+            if col_name not in table_schema["primary_key"]:
+                table_schema["primary_key"].append(col_name)
+            idx += 2
+        elif keyword == "UNIQUE":
+            col_info["unique"] = True
+            # Add to table's unique constraints list if not already present from a table-level UNIQUE constraint
+            if [col_name] not in table_schema["unique_constraints"]:
+                table_schema["unique_constraints"].append([col_name])
+            idx += 1
+        elif keyword in ("CHECK", "AS") and next_keyword == "(" or keyword == "GENERATED":
+            if keyword == "GENERATED": # GENERATED ALWAYS AS (expr)
+                while idx < len(tokens) and tokens[idx][1] != "(":
+                    idx += 1
+                keyword = "AS"
             else:
-                current_def += char
-
-            if char_idx == len(body) -1: # Add the last definition after loop
-                 definitions.append(current_def.strip())
+                idx += 1
+            close_idx = _matching_paren(tokens, idx)
+            if close_idx < len(tokens):
+                extras["check" if keyword == "CHECK" else "generated"] = stmt[tokens[idx][3]:tokens[close_idx][2]].strip()
+            idx = close_idx + 1
+        elif keyword == "DEFAULT" and idx + 1 < len(tokens):
+            idx += 1
+            if tokens[idx][1] == "(":
+                close_idx = _matching_paren(tokens, idx)
+                extras["default"] = stmt[tokens[idx][2]:tokens[min(close_idx, len(tokens) - 1)][3]]
+                idx = close_idx + 1
+            else:
+                value_start = tokens[idx][2]
+                if tokens[idx][1] in ("+", "-") and idx + 1 < len(tokens):
+                    idx += 1
+                extras["default"] = stmt[value_start:tokens[idx][3]]
+                idx += 1
+        elif keyword == "COLLATE" and idx + 1 < len(tokens):
+            extras["collate"] = _unquote_identifier(tokens[idx + 1][1])
+            idx += 2
+        elif keyword == "REFERENCES" and idx + 1 < len(tokens):
+            ref_table = _unquote_identifier(tokens[idx + 1][1])
+            ref_cols = []
+            idx += 2
+            if idx < len(tokens) and tokens[idx][1] == "(":
+                close_idx = _matching_paren(tokens, idx)
+                ref_cols = _identifier_list(tokens[idx + 1:close_idx])
+                idx = close_idx + 1
+            table_schema["foreign_keys"].append({
+                "columns": [col_name],
+                "references_table": ref_table,
+                "references_columns": ref_cols,
+                "raw_definition": stmt[tokens[0][2]:tokens[-1][3]]
+            })
+        elif keyword == "CONSTRAINT":
+            idx += 2 # Skip the constraint name
+        else:
+            idx += 1 # NULL, ASC/DESC, AUTOINCREMENT, ON CONFLICT ..., etc.
+
+    col_info.update(extras)
+    table_schema["columns"].append(col_info)
+
+def _parse_table_constraint(stmt, tokens, table_schema):
+    if tokens[0][1].upper() == "CONSTRAINT":
+        tokens = tokens[2:] # Skip "CONSTRAINT name"
+        if not tokens:
+            return
+    keyword = tokens[0][1].upper()
+    open_idx = next((idx for idx, token in enumerate(tokens) if token[1] == "("), None)
+    if open_idx is None:
+        return
+    close_idx = _matching_paren(tokens, open_idx)
+    inner = tokens[open_idx + 1:close_idx]
+
+    if keyword == "PRIMARY":
+        # Overwrite or initialize primary_key list for the table
+        table_schema["primary_key"] = _identifier_list(inner)
+    elif keyword == "UNIQUE":
+        unique_cols = _identifier_list(inner)
+        if unique_cols not in table_schema["unique_constraints"]:
+            table_schema["unique_constraints"].append(unique_cols)
+    elif keyword == "CHECK":
+        if close_idx < len(tokens):
+            table_schema["check_constraints"].append(stmt[tokens[open_idx][3]:tokens[close_idx][2]].strip())
+    elif keyword == "FOREIGN":
+        rest = tokens[close_idx + 1:]
+        if len(rest) < 2 or rest[0][1].upper() != "REFERENCES":
+            return
+        ref_cols = []
+        if len(rest) > 2 and rest[2][1] == "(":
+            ref_cols = _identifier_list(rest[3:_matching_paren(rest, 2)])
+        table_schema["foreign_keys"].append({
+            "columns": _identifier_list(inner),
+            "references_table": _unquote_identifier(rest[1][1]),
+            "references_columns": ref_cols,
+            "raw_definition": stmt[tokens[0][2]:tokens[-1][3]] # Store raw for debugging or richer parsing later
+        })
+
+def _add_simple_column(col_match, table_schema):
+    col_name = _unquote_identifier(col_match.group(1))
+    col_info = {"name": col_name, "type": col_match.group(2)}
+    if col_match.group(3):
+        col_info["not_null"] = True
+    if col_match.group(4): # If inline UNIQUE constraint
+        col_info["unique"] = True
+        # Add to table's unique constraints list if not already present from a table-level UNIQUE constraint
+        if [col_name] not in table_schema["unique_constraints"]:
+            table_schema["unique_constraints"].append([col_name])
+    if col_match.group(5): # If inline PRIMARY KEY constraint
+        col_info["primary_key_inline"] = True # Mark that this column is part of PK, potentially composite
+        if col_name not in table_schema["primary_key"]:
+            table_schema["primary_key"].append(col_name)
+    if col_match.group(6) is not None:
+        col_info["default"] = col_match.group(6)
+    table_schema["columns"].append(col_info)
+
+def _parse_create_table(stmt):
+    # Returns (table_name, table_schema), or None if stmt is not a CREATE TABLE (... ) statement.
+    header = _CREATE_TABLE_RE.match(stmt)
+    if not header:
+        return None
+    table_name = _unquote_identifier(header.group(1))
+    table_schema = {"columns": [], "primary_key": [], "foreign_keys": [], "unique_constraints": [], "check_constraints": []}
+
+    # Walk the body one definition at a time. Plain columns are consumed by a single
+    # _SIMPLE_COLUMN_RE match; anything else is delimited by scanning for the next top-level
+    # comma and handed to the token-based parsers.
+    pos = header.end()
+    length = len(stmt)
+    while pos < length:
+        col_match = _SIMPLE_COLUMN_RE.match(stmt, pos)
+        if col_match:
+            _add_simple_column(col_match, table_schema)
+            pos = col_match.end()
+            if col_match.group(7) == ")":
+                break
+            continue
 
-        for def_idx, definition in enumerate(definitions):
-            definition = definition.strip()
-            if not definition:
+        depth = 1
+        def_end = length
+        for match in _DDL_STRUCTURE_RE.finditer(stmt, pos):
+            char = match.group()
+            if len(char) > 1: # Quoted text, comment or flat parenthesized group
                 continue
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth == 0:
+                    def_end = match.start()
+                    break
+            elif char == "," and depth == 1:
+                def_end = match.start()
+                break
+
+        definition = stmt[pos:def_end].strip()
+        if definition[:2] in ("--", "/*"):
+            definition = definition[_LEADING_COMMENTS_RE.match(definition).end():]
+        if definition:
+            tokens = _tokenize_ddl(definition)
+            if _TABLE_CONSTRAINT_RE.match(definition):
+                _parse_table_constraint(definition, tokens, table_schema)
+            elif tokens:
+                # Inline CHECK/DEFAULT/REFERENCES/COLLATE, untyped columns, comments, ...
+                _parse_column_definition(definition, tokens, table_schema)
+        if def_end >= length or stmt[def_end] == ")":
+            break
+        pos = def_end + 1
+    return table_name, table_schema
 
-            # Try to parse as column definition (name, type, and inline constraints)
-            # Regex handles quoted/unquoted names, various types including varchar(n), and common inline constraints.
-            col_match = re.match(
-                r'\"?(\w+)\"?\s+'                                                                # Column name (group 1)
-                r"((?:VARCHAR|INTEGER|TEXT|REAL|BOOLEAN|FLOAT|DATETIME|BLOB|NUMERIC)(?:\(\s*\d+\s*(?:,\s*\d+)?\s*\))?)"  # Type (group 2)
-                r"((?:\s+NOT\s+NULL)?)"                                                         # NOT NULL (group 3)
-                r"((?:\s+UNIQUE)?)"                                                             # UNIQUE (group 4)
-                r"((?:\s+PRIMARY\s+KEY)?)"                                                      # PRIMARY KEY (group 5)
-                r"((?:\s+CHECK\s*\(.*?\))?)"                                                    # Inline CHECK (group 6) - basic
-                r"((?:\s+DEFAULT\s+.*?Z)?)"                                                 # Inline DEFAULT (group 7) - basic
-                , definition, re.IGNORECASE
-            )
-
-            if col_match:
-                col_name = col_match.group(1).replace('"', '')
-                col_type = col_match.group(2)
-                is_not_null = bool(col_match.group(3) and col_match.group(3).strip()) #is_not_null = "NOT NULL" in col_match.group(3).upper() if col_match.group(3) else False
-                is_unique = bool(col_match.group(4) and col_match.group(4).strip()) #is_unique = "UNIQUE" in col_match.group(4).upper() if col_match.group(4) else False
-                is_pk = bool(col_match.group(5) and col_match.group(5).strip()) #is_pk = "PRIMARY KEY" in col_match.group(5).upper() if col_match.group(5) else False
-
-                col_info = {"name": col_name, "type": col_type}
-                if is_not_null: col_info["not_null"] = True
-                if is_unique: # If inline UNIQUE constraint
-                    col_info["unique"] = True
-                    # Add to table's unique constraints list if not already present from a table-level UNIQUE constraint
-                    if [col_name] not in parsed_schemas[table_name]["unique_constraints"]:
-                         parsed_schemas[table_name]["unique_constraints"].append([col_name])
-                if is_pk: # If inline PRIMARY KEY constraint
-                    col_info["primary_key_inline"] = True # Mark that this column is part of PK, potentially composite
-                    # Add to table's primary key list if not already present
-                    if col_name not in parsed_schemas[table_name]["primary_key"]:
-                         parsed_schemas[table_name]["primary_key"].append(col_name)
-                # TODO: Capture and store inline CHECK and DEFAULT constraints if regex is expanded
-
-                parsed_schemas[table_name]["columns"].append(col_info)
-
-            # Table-level PRIMARY KEY constraint
-            elif definition.upper().startswith("PRIMARY KEY"):
-                pk_match = re.search(r"PRIMARY KEY\s*\((.+?)\)", definition, re.IGNORECASE) # Non-greedy match for columns
-                if pk_match:
-                    pk_cols_str = pk_match.group(1)
-                    # Split columns, strip whitespace and remove quotes
-                    pk_cols = [col.strip().replace('"', '') for col in pk_cols_str.split(',')]
-                    # Overwrite or initialize primary_key list for the table
-                    parsed_schemas[table_name]["primary_key"] = pk_cols
-
-            # Table-level UNIQUE constraint
-            elif definition.upper().startswith("UNIQUE"):
-                unique_match = re.search(r"UNIQUE\s*\((.+?)\)", definition, re.IGNORECASE) # Non-greedy
-                if unique_match:
-                    unique_cols_str = unique_match.group(1)
-                    unique_cols = [col.strip().replace('"', '') for col in unique_cols_str.split(',')]
-                    # Append to unique_constraints list
-                    if unique_cols not in parsed_schemas[table_name]["unique_constraints"]:
-                        parsed_schemas[table_name]["unique_constraints"].append(unique_cols)
-
-            # FOREIGN KEY constraint
-            elif definition.upper().startswith("FOREIGN KEY"):
-                fk_match = re.search(r"FOREIGN KEY\s*\((.+?)\)\s*REFERENCES\s*\"?(\w+)\"?\s*\((.+?)\)", definition, re.IGNORECASE) # Non-greedy
-                if fk_match:
-                    fk_from_cols = [col.strip().replace('"', '') for col in fk_match.group(1).split(',')]
-                    fk_ref_table = fk_match.group(2).replace('"', '') # Already unquoted by capture group
-                    fk_ref_cols = [col.strip().replace('"', '') for col in fk_match.group(3).split(',')]
-                    fk_info = {
-                        "columns": fk_from_cols,
-                        "references_table": fk_ref_table,
-                        "references_columns": fk_ref_cols,
-                        "raw_definition": definition # Store raw for debugging or richer parsing later
-                    }
-                    parsed_schemas[table_name]["foreign_keys"].append(fk_info)
-
-            # CHECK constraint (table-level or uncaptured inline)
-            elif definition.upper().startswith("CHECK"):
-                check_match = re.search(r"CHECK\s*\((.+)\)", definition, re.IGNORECASE) # Greedy, as check can be complex
-                if check_match:
-                    check_constraint_expression = check_match.group(1)
-                    parsed_schemas[table_name]["check_constraints"].append(check_constraint_expression)
+def parse_ddl_statements(ddl_statements: list[str]) -> dict:
+    # Linear-time parse of CREATE TABLE statements into
+    # {table: {columns, primary_key, foreign_keys, unique_constraints, check_constraints}}.
+    # Results are memoized per statement hash, so reparsing an unchanged schema is a lookup.
+    parsed_schemas = {}
+    for stmt in ddl_statements:
+        key = hashlib.sha1(stmt.encode("utf-8")).digest()
+        parsed = _parsed_statement_memo.get(key)
+        if parsed is None:
+            parsed = _parse_create_table(stmt) or (None, None)
+            _parsed_statement_memo.set(key, parsed)
+        table_name, table_schema = parsed
+        if table_name is not None:
+            parsed_schemas[table_name] = table_schema
     return parsed_schemas
 
+def read_ddl_from_sqlite(sqlite_path):
+    # CREATE TABLE statements straight from a SQLite file's sqlite_master, in creation order.
+    connection = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND sql IS NOT NULL "
+            "AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+        ).fetchall()
+    finally:
+        connection.close()
+    return [row[0] for row in rows]
+
+_ddl_source_cache = None  # (source key, source hash, statements)
+
+
+def get_ddl_source():
+    # (source_hash, statements) for the configured DDL source. The SQLite file is only re-read
+    # when its mtime/size change, so callers can cheaply check for schema changes per request.
+    global _ddl_source_cache
+    if DDL_SOURCE_SQLITE_PATH:
+        stat = os.stat(DDL_SOURCE_SQLITE_PATH)
+        source_key = (DDL_SOURCE_SQLITE_PATH, stat.st_mtime_ns, stat.st_size)
+    else:
+        source_key = ("builtin", id(ALL_DDL_STATEMENTS), len(ALL_DDL_STATEMENTS))
+    cached = _ddl_source_cache
+    if cached is not None and cached[0] == source_key:
+        return cached[1], cached[2]
+
+    statements = read_ddl_from_sqlite(DDL_SOURCE_SQLITE_PATH) if DDL_SOURCE_SQLITE_PATH else list(ALL_DDL_STATEMENTS)
+    source_hash = hashlib.sha256("\0".join(statements).encode("utf-8")).hexdigest()
+    _ddl_source_cache = (source_key, source_hash, statements)
+    return source_hash, statements
+
 
 def format_constraints(column_info):
     constraints = []
@@ -178,33 +628,19 @@ def format_constraints(column_info):
     # Note: table-level PKs are in parsed_schemas[table_name]["primary_key"]
     return ", ".join(constraints)
 
-def populate_schema_in_chromadb(collection=None, parsed_schemas=None):
-    if collection is None:
-        collection = get_particles_collection()
-
-    if parsed_schemas is None:
-        parsed_schemas = parse_ddl_statements(ALL_DDL_STATEMENTS)
-
-    existing_ids_to_delete = []
-    for table_name in parsed_schemas:
-        existing_ids_to_delete.append(f"table_schema_{table_name}")
-        for column in parsed_schemas[table_name].get("columns", []):
-            existing_ids_to_delete.append(f"col_schema_{table_name}_{column['name']}")
-
-    if existing_ids_to_delete:
-        try:
-            existing_docs_check = collection.get(ids=existing_ids_to_delete, include=[]) # Only check IDs
-            if existing_docs_check and existing_docs_check['ids']:
-                 collection.delete(ids=existing_docs_check['ids'])
-        except Exception as e:
-            # print(f"Note: Could not verify/delete schema documents during populate (may not exist yet): {e}")
-            pass
+def _content_hash(document, metadata):
+    # Stable hash of a document and its metadata, stored in the metadata to diff reloads.
+    payload = json.dumps([document, metadata], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
+def document_etag(document, metadata):
+    # Hash of what is stored now; a stored content_hash may predate a partial metadata update
+    return _content_hash(document, metadata)
 
+def build_schema_documents(parsed_schemas):
     documents = []
     metadatas = []
     ids = []
-    doc_count = 0
 
     for table_name, table_info in parsed_schemas.items():
         col_names = [col["name"] for col in table_info.get("columns", [])]
@@ -220,7 +656,6 @@ def populate_schema_in_chromadb(collection=None, parsed_schemas=None):
         ids.append(f"table_schema_{table_name}")
         documents.append(table_doc_content)
         metadatas.append({"type": "table_schema", "table_name": table_name, "source": "ddl_parser"})
-        doc_count += 1
 
         for column in table_info.get("columns", []):
             # Pass full column dict to format_constraints
@@ -238,15 +673,67 @@ def populate_schema_in_chromadb(collection=None, parsed_schemas=None):
                 "data_type": column['type'],
                 "source": "ddl_parser"
             })
-            doc_count +=1
 
-    if documents:
-        collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas
-        )
-    return doc_count
+    for document, metadata in zip(documents, metadatas):
+        metadata["content_hash"] = _content_hash(document, metadata)
+    return ids, documents, metadatas
+
+def populate_schema_in_chromadb(collection=None, parsed_schemas=None, progress_callback=None):
+    # Diff the parsed schema against the schema documents already in the collection (by the
+    # content_hash stored in their metadata) and only write what changed, so a reload costs
+    # time in proportion to the size of the change rather than the size of the schema.
+    if collection is None:
+        collection = get_particles_collection()
+
+    if parsed_schemas is None:
+        parsed_schemas = parse_ddl_statements(ALL_DDL_STATEMENTS)
+
+    ids, documents, metadatas = build_schema_documents(parsed_schemas)
+
+    existing = collection.get(where={"source": "ddl_parser"}, include=["metadatas"])
+    existing_hashes = {
+        doc_id: (metadata or {}).get("content_hash")
+        for doc_id, metadata in zip(existing["ids"], existing["metadatas"] or [None] * len(existing["ids"]))
+    }
+
+    summary = {"documents": len(ids), "added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    upsert_positions = []
+    for position, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+        if doc_id not in existing_hashes:
+            summary["added"] += 1
+        elif existing_hashes[doc_id] != metadata["content_hash"]:
+            summary["changed"] += 1
+        else:
+            summary["unchanged"] += 1
+            continue
+        upsert_positions.append(position)
+
+    new_ids = set(ids)
+    removed_ids = [doc_id for doc_id in existing_hashes if doc_id not in new_ids]
+    summary["removed"] = len(removed_ids)
+
+    # progress_callback(written, total) counts deleted plus upserted documents
+    total_writes = len(removed_ids) + len(upsert_positions)
+    if progress_callback is not None:
+        progress_callback(0, total_writes)
+    for batch_start in range(0, len(removed_ids), SCHEMA_WRITE_BATCH_SIZE):
+        batch_ids = removed_ids[batch_start:batch_start + SCHEMA_WRITE_BATCH_SIZE]
+        collection.delete(ids=batch_ids)
+        record_collection_write(collection.name, deleted_ids=batch_ids)
+        if progress_callback is not None:
+            progress_callback(batch_start + len(batch_ids), total_writes)
+    for batch_start in range(0, len(upsert_positions), SCHEMA_WRITE_BATCH_SIZE):
+        batch = upsert_positions[batch_start:batch_start + SCHEMA_WRITE_BATCH_SIZE]
+        upserted = {
+            "ids": [ids[i] for i in batch],
+            "documents": [documents[i] for i in batch],
+            "metadatas": [metadatas[i] for i in batch]
+        }
+        collection.upsert(**upserted)
+        record_collection_write(collection.name, upserted=upserted)
+        if progress_callback is not None:
+            progress_callback(len(removed_ids) + batch_start + len(batch), total_writes)
+    return summary
 
 
 if __name__ == '__main__':
@@ -295,8 +782,8 @@ if __name__ == '__main__':
 
     test_collection_for_schema = get_particles_collection(test_client) # Get a fresh collection
 
-    num_docs_added = populate_schema_in_chromadb(collection=test_collection_for_schema, parsed_schemas=parsed_schema_data)
-    print(f"Populated {num_docs_added} schema documents into ChromaDB.")
+    populate_summary = populate_schema_in_chromadb(collection=test_collection_for_schema, parsed_schemas=parsed_schema_data)
+    print(f"Populated {populate_summary['documents']} schema documents into ChromaDB ({populate_summary}).")
 
     results_table = test_collection_for_schema.query(
         query_texts=["information about pdgitem table"],
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+from cache_utils import LRUTTLCache
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; appends are then only serialized per process
+    fcntl = None
+
+EMBEDDING_CACHE_DIRNAME = "embedding_cache"
+EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get("EMBEDDING_CACHE_MAX_ROWS", 1_000_000))
+# Query vectors are kept in memory only (see CachedEmbeddingFunction.embed_query)
+EMBEDDING_QUERY_CACHE_SIZE = int(os.environ.get("EMBEDDING_QUERY_CACHE_SIZE", 4096))
+
+_KEY_BYTES = 16
+
+
+class EmbeddingStore:
+    # Append-only, content-hash keyed store of float32 vectors.
+    # Records are fixed-size (16-byte blake2b key + dim float32 values) in a single file that is
+    # memory-mapped for reads, so a cold start only has to scan the keys to rebuild the index.
+
+    def __init__(self, directory, max_rows=EMBEDDING_CACHE_MAX_ROWS):
+        self.directory = directory
+        self.max_rows = max_rows
+        self._records_path = os.path.join(directory, "embeddings.bin")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.Lock()
+        self._dim = None
+        self._dtype = None
+        self._records = None  # np.memmap over the persisted records
+        self._index = {}  # key -> row
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._meta_path) or not os.path.exists(self._records_path):
+            return
+        with open(self._meta_path) as f:
+            self._set_dim(json.load(f)["dim"])
+        record_size = self._dtype.itemsize
+        with open(self._records_path, "r+b") as f:
+            # Under the append lock, so a record another process is still writing is never
+            # mistaken for a torn tail.
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                size = os.fstat(f.fileno()).st_size
+                if size % record_size:
+                    # A write was interrupted; drop the torn tail so appends stay aligned.
+                    f.truncate(size - size % record_size)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        self._remap()
+        if self._records is not None:
+            keys = self._records["key"]
+            self._index = {bytes(key): row for row, key in enumerate(keys)}
+
+    def _set_dim(self, dim):
+        self._dim = dim
+        self._dtype = np.dtype([("key", f"V{_KEY_BYTES}"), ("vector", "<f4", (dim,))])
+
+    def _remap(self):
+        rows = os.path.getsize(self._records_path) // self._dtype.itemsize
+        self._records = np.memmap(self._records_path, dtype=self._dtype, mode="r", shape=(rows,)) if rows else None
+
+    def get_many(self, keys):
+        # Returns a list aligned with keys: a float32 vector, or None when not cached. Each row
+        # stores its key, and a row whose key does not match is treated as a miss.
+        with self._lock:
+            records = self._records
+            rows = [self._index.get(key) for key in keys]
+        vectors = []
+        for key, row in zip(keys, rows):
+            if row is None or records is None or row >= len(records) or bytes(records[row]["key"]) != key:
+                vectors.append(None)
+            else:
+                vectors.append(np.array(records[row]["vector"]))
+        return vectors
+
+    def put_many(self, keys, vectors):
+        with self._lock:
+            new_rows = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._index]
+            if not new_rows:
+                return
+            if self._dim is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._set_dim(len(new_rows[0][1]))
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dim": self._dim}, f)
+            new_rows = new_rows[:max(0, self.max_rows - len(self._index))]
+            if not new_rows:
+                return
+
+            block = np.empty(len(new_rows), dtype=self._dtype)
+            for i, (key, vector) in enumerate(new_rows):
+                block[i]["key"] = key
+                block[i]["vector"] = vector
+            # Single append so concurrent readers only ever see whole records. The file lock
+            # keeps other processes (e.g. gunicorn workers) from appending between reading the
+            # end offset and writing, which would make our row numbers point at their records.
+            with open(self._records_path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0, os.SEEK_END)
+                    first_row = f.tell() // self._dtype.itemsize
+                    f.write(block.tobytes())
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            for offset, (key, _) in enumerate(new_rows):
+                self._index[key] = first_row + offset
+            self._remap()
+
+    def __len__(self):
+        return len(self._index)
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    # Wraps an embedding function and skips model inference for text it has already embedded.
+    # The vectors are identical to the wrapped function's, so the collection configuration keeps
+    # the wrapped function's name and config. Documents go to the persistent store; query text
+    # (embed_query) is open-ended user input, so it is only cached in a bounded in-memory LRU.
+
+    def __init__(self, embedding_function, store, query_cache_size=EMBEDDING_QUERY_CACHE_SIZE):
+        self._embedding_function = embedding_function
+        self._store = store
+        self._query_cache = LRUTTLCache(max_entries=query_cache_size, ttl_seconds=float("inf"))
+        self._model_prefix = (embedding_function.name() + "\0").encode("utf-8")
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _key(self, text):
+        return hashlib.blake2b(self._model_prefix + text.encode("utf-8"), digest_size=_KEY_BYTES).digest()
+
+    def __call__(self, input):
+        keys = [self._key(text) for text in input]
+        vectors = self._store.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self._embedding_function([input[i] for i in missing])
+            computed = [np.asarray(vector, dtype=np.float32) for vector in computed]
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            self._store.put_many([keys[i] for i in missing], computed)
+        self._count(len(input), len(missing))
+        return vectors
+
+    def embed_query(self, input):
+        # Looks in the query LRU, then the persistent store (a query can repeat a document's
+        # text), and never appends to the store.
+        keys = [self._key(text) for text in input]
+        vectors = [self._query_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, self._store.get_many([keys[i] for i in missing])):
+                vectors[i] = vector
+        computed_rows = [i for i in missing if vectors[i] is None]
+        if computed_rows:
+            computed = self._embedding_function.embed_query([input[i] for i in computed_rows])
+            for i, vector in zip(computed_rows, computed):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+        for i in missing:
+            self._query_cache.set(keys[i], vectors[i])
+        self._count(len(input), len(computed_rows))
+        return vectors
+
+    def _count(self, lookups, misses):
+        with self._stats_lock:
+            self._stats["hits"] += lookups - misses
+            self._stats["misses"] += misses
+
+    @staticmethod
+    def name():
+        return "default"
+
+    def get_config(self):
+        return self._embedding_function.get_config()
+
+    @staticmethod
+    def build_from_config(config):
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        return DefaultEmbeddingFunction.build_from_config(config)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["stored_vectors"] = len(self._store)
+        stats["max_rows"] = self._store.max_rows
+        query_cache = self._query_cache.get_stats()
+        stats["query_cache"] = {"size": query_cache["size"], "max_entries": query_cache["max_entries"]}
+        return stats
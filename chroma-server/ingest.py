@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chroma_utils import (
+    CHROMA_DATA_PATH, ALL_DDL_STATEMENTS, parse_ddl_statements, get_particles_collection,
+    get_embedding_function, record_collection_write
+)
+
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", 512))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 4))
+INGEST_CHECKPOINT_PATH = os.path.join(CHROMA_DATA_PATH, "ingest_checkpoints.json")
+SQLITE_SOURCE_PATH = os.environ.get("SQLITE_SOURCE_PATH", "pdg.sqlite")
+
+# Columns tried, in order, to describe a row referenced through a foreign key
+# (e.g. the particle description for pdgmeasurement.pdgid_id). Only text columns qualify, and
+# readable names come before codes such as pdgid.pdgid, which are only used as a last resort.
+FK_LABEL_COLUMNS = ("name", "description", "title", "symbol", "text", "pdgid")
+_TEXT_TYPE_MARKERS = ("CHAR", "TEXT", "CLOB")
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _source_signature(sqlite_path):
+    # Identifies the file the checkpointed rowids belong to; a replaced or modified file
+    # gets a new signature.
+    stat = os.stat(sqlite_path)
+    return {"path": os.path.abspath(sqlite_path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _load_checkpoints(checkpoint_path):
+    # {"source": signature of the SQLite file, "tables": {table: last written rowid}}
+    if not os.path.exists(checkpoint_path):
+        return {"source": None, "tables": {}}
+    with open(checkpoint_path) as f:
+        checkpoints = json.load(f)
+    if not isinstance(checkpoints.get("tables"), dict):
+        # Older files held only the per-table rowids, with no source to check them against.
+        return {"source": None, "tables": {}}
+    return checkpoints
+
+
+def _save_checkpoints(checkpoint_path, checkpoints):
+    # Write-then-rename so an interrupted load never leaves a half-written checkpoint file.
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoints, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _fk_label_column(ref_table_info):
+    text_columns = {
+        col["name"] for col in ref_table_info.get("columns", [])
+        if any(marker in (col.get("type") or "TEXT").upper() for marker in _TEXT_TYPE_MARKERS)
+    }
+    return next((col for col in FK_LABEL_COLUMNS if col in text_columns), None)
+
+
+def build_row_query(table_name, table_info, parsed_schemas):
+    # SELECT for one table with a LEFT JOIN per foreign key whose target has a label column.
+    # Rows are read in rowid order with keyset pagination (rowid > ?), so each chunk is an index
+    # seek and an interrupted load can resume from the last rowid.
+    columns = [col["name"] for col in table_info["columns"]]
+    select = ["t.rowid AS __rowid"] + [f"t.{_quote(col)}" for col in columns]
+    joins = []
+    labels = []
+    for fk_idx, fk in enumerate(table_info.get("foreign_keys", [])):
+        ref_table = fk["references_table"]
+        label_column = _fk_label_column(parsed_schemas.get(ref_table, {}))
+        if label_column is None or len(fk["columns"]) != len(fk["references_columns"]):
+            continue
+        alias = f"fk{fk_idx}"
+        on = " AND ".join(
+            f"{alias}.{_quote(ref_col)} = t.{_quote(col)}"
+            for col, ref_col in zip(fk["columns"], fk["references_columns"])
+        )
+        joins.append(f"LEFT JOIN {_quote(ref_table)} {alias} ON {on}")
+        select.append(f"{alias}.{_quote(label_column)} AS __fk{fk_idx}")
+        # Keyed by the FK's own columns: several FKs may point at the same table (pdgdecay.pdgid_id
+        # and pdgdecay.subdecay_id both reference pdgid).
+        metadata_key = f"{'_'.join(fk['columns'])}_{label_column}"
+        labels.append((f"__fk{fk_idx}", ", ".join(fk["columns"]), ref_table, label_column, metadata_key))
+
+    sql = (
+        f"SELECT {', '.join(select)} FROM {_quote(table_name)} t {' '.join(joins)} "
+        f"WHERE t.rowid > ? ORDER BY t.rowid LIMIT ?"
+    )
+    return sql, columns, labels
+
+
+def row_to_document(table_name, row, columns, labels):
+    parts = [f"{col}={row[col]}" for col in columns if row[col] is not None]
+    document = f"Row of table {table_name}: " + ", ".join(parts) + "."
+    context = [
+        f"{fk_columns} references {ref_table} {label_column}={row[key]}"
+        for key, fk_columns, ref_table, label_column, _ in labels if row[key] is not None
+    ]
+    if context:
+        document += " " + "; ".join(context) + "."
+
+    metadata = {"type": "table_row", "table_name": table_name, "row_id": row["__rowid"], "source": "sqlite_ingest"}
+    for key, _, _, _, metadata_key in labels:
+        if row[key] is not None:
+            metadata[metadata_key] = str(row[key])
+    return f"row_{table_name}_{row['__rowid']}", document, metadata
+
+
+def _iter_chunks(connection, table_name, table_info, parsed_schemas, start_rowid, chunk_size):
+    sql, columns, labels = build_row_query(table_name, table_info, parsed_schemas)
+    last_rowid = start_rowid
+    while True:
+        rows = connection.execute(sql, (last_rowid, chunk_size)).fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1]["__rowid"]
+        yield last_rowid, [row_to_document(table_name, row, columns, labels) for row in rows]
+
+
+def ingest_sqlite_rows(sqlite_path=SQLITE_SOURCE_PATH, tables=None, collection=None, parsed_schemas=None,
+                       chunk_size=INGEST_CHUNK_SIZE, workers=INGEST_WORKERS,
+                       checkpoint_path=INGEST_CHECKPOINT_PATH, progress_callback=None):
+    # Stream rows from a SQLite file into Chroma in fixed-size chunks.
+    # Embedding runs on a worker pool while the next chunks are read; at most `workers` chunks
+    # are in flight, so memory stays flat regardless of table size. Chunks are written in
+    # order and the last written rowid per table is checkpointed after each write. Checkpoints
+    # left by a different or since-modified file are discarded, since its rowids no longer apply.
+    if collection is None:
+        collection = get_particles_collection()
+    if parsed_schemas is None:
+        parsed_schemas = parse_ddl_statements(ALL_DDL_STATEMENTS)
+
+    connection = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    existing_tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if tables is None:
+        tables = [table_name for table_name in parsed_schemas if table_name in existing_tables]
+    for table_name in tables:
+        if table_name not in parsed_schemas or table_name not in existing_tables:
+            connection.close()
+            raise ValueError(f"Table '{table_name}' is not present in both the parsed schema and {sqlite_path}")
+
+    # Row documents rarely repeat, so they bypass the persistent embedding cache.
+    embedding_function = get_embedding_function(use_cache=False)
+    source = _source_signature(sqlite_path)
+    checkpoints = _load_checkpoints(checkpoint_path)
+    if checkpoints["source"] != source:
+        checkpoints = {"source": source, "tables": {}}
+    summary = {"tables": {}, "rows": 0, "seconds": 0.0}
+    started = time.perf_counter()
+
+    def write_chunk(table_name, last_rowid, chunk, embeddings_future):
+        ids, documents, metadatas = zip(*chunk)
+        upserted = {
+            "ids": list(ids), "documents": list(documents), "metadatas": list(metadatas),
+            "embeddings": embeddings_future.result()
+        }
+        collection.upsert(**upserted)
+        record_collection_write(collection.name, upserted=upserted)
+        checkpoints["tables"][table_name] = last_rowid
+        _save_checkpoints(checkpoint_path, checkpoints)
+        summary["tables"][table_name] += len(chunk)
+        summary["rows"] += len(chunk)
+        if progress_callback is not None:
+            progress_callback(table_name, summary["rows"])
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for table_name in tables:
+                summary["tables"][table_name] = 0
+                pending = []
+                for last_rowid, chunk in _iter_chunks(
+                    connection, table_name, parsed_schemas[table_name], parsed_schemas,
+                    checkpoints["tables"].get(table_name, 0), chunk_size
+                ):
+                    documents = [document for _, document, _ in chunk]
+                    pending.append((table_name, last_rowid, chunk, executor.submit(embedding_function, documents)))
+                    if len(pending) >= workers:
+                        write_chunk(*pending.pop(0))
+                while pending:
+                    write_chunk(*pending.pop(0))
+    finally:
+        connection.close()
+        summary["seconds"] = time.perf_counter() - started
+        summary["rows_per_second"] = summary["rows"] / summary["seconds"] if summary["seconds"] else 0.0
+    return summary
+
+
+def reset_checkpoints(tables=None, checkpoint_path=INGEST_CHECKPOINT_PATH):
+    checkpoints = _load_checkpoints(checkpoint_path)
+    for table_name in (tables if tables is not None else list(checkpoints["tables"])):
+        checkpoints["tables"].pop(table_name, None)
+    _save_checkpoints(checkpoint_path, checkpoints)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream rows from a SQLite database into the Chroma collection.")
+    parser.add_argument("sqlite_path", nargs="?", default=SQLITE_SOURCE_PATH)
+    parser.add_argument("--tables", nargs="*", help="Tables to ingest (default: every parsed table present in the file)")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints and start from the first row")
+    args = parser.parse_args()
+
+    if args.restart:
+        reset_checkpoints(args.tables)
+    result = ingest_sqlite_rows(
+        args.sqlite_path, tables=args.tables, chunk_size=args.chunk_size, workers=args.workers,
+        progress_callback=lambda table_name, rows: print(f"{table_name}: {rows} rows ingested", end="\r")
+    )
+    print(f"\nIngested {result['rows']} rows in {result['seconds']:.1f}s: {result['tables']}")
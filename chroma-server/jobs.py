@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for GET /api/jobs/<id>; the oldest are dropped first
+JOB_HISTORY_SIZE = int(os.environ.get("JOB_HISTORY_SIZE", 100))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class Job:
+
+    def __init__(self, kind, params, run):
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.params = params
+        self.key = (kind, json.dumps(params, sort_keys=True))
+        self.state = QUEUED
+        self.coalesced = 0  # duplicate submissions merged into this job while it was queued
+        self.documents = 0
+        self.total = None
+        self.detail = None  # e.g. the table being loaded
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._run = run
+        self._done = threading.Event()
+
+    def progress(self, documents, total=None, detail=None):
+        # Called by the running job; documents is the number written so far
+        self.documents = documents
+        if total is not None:
+            self.total = total
+        if detail is not None:
+            self.detail = detail
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        seconds = end - self.started_at if self.started_at else 0.0
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "state": self.state,
+            "coalesced": self.coalesced,
+            "progress": {"documents": self.documents, "total": self.total, "detail": self.detail},
+            "docs_per_second": self.documents / seconds if seconds else 0.0,
+            "seconds": seconds,
+            "queued_seconds": (self.started_at or end) - self.submitted_at,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    # Runs collection loads one at a time on a single writer thread, so concurrent load requests
+    # never interleave their deletes and upserts. Submitting a job identical (same kind and
+    # params) to one that is still queued returns the queued job instead of adding another:
+    # the queued run reads its source when it starts, so it covers every trigger before it.
+
+    def __init__(self, history_size=JOB_HISTORY_SIZE):
+        self.history_size = history_size
+        self._lock = threading.Condition()
+        self._queue = deque()
+        self._jobs = OrderedDict()  # id -> Job, in submission order
+        self._queued_by_key = {}
+        self._thread = None
+        self._stats = {"submitted": 0, "coalesced": 0, "succeeded": 0, "failed": 0}
+
+    def submit(self, kind, params, run):
+        # run(job) does the work, reporting through job.progress(); its return value becomes
+        # job.result. Returns (job, coalesced).
+        with self._lock:
+            job = Job(kind, params, run)
+            queued = self._queued_by_key.get(job.key)
+            if queued is not None:
+                queued.coalesced += 1
+                self._stats["coalesced"] += 1
+                return queued, True
+            self._jobs[job.id] = job
+            self._queued_by_key[job.key] = job
+            self._queue.append(job)
+            self._stats["submitted"] += 1
+            self._trim_history()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="chroma-writer", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+            return job, False
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in (SUCCEEDED, FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._lock.wait()
+                job = self._queue.popleft()
+                del self._queued_by_key[job.key]
+                job.state = RUNNING
+                job.started_at = time.time()
+            logger.info(f"Job {job.id} ({job.kind}) started.")
+            try:
+                result = job._run(job)
+                state = SUCCEEDED
+            except Exception as e:
+                logger.exception(f"Job {job.id} ({job.kind}) failed")
+                result, state = None, FAILED
+                job.error = str(e)
+            with self._lock:
+                job.result = result
+                job.state = state
+                job.finished_at = time.time()
+                self._stats[state] += 1
+                self._trim_history()
+            job._done.set()
+            logger.info(f"Job {job.id} ({job.kind}) {state} in {job.finished_at - job.started_at:.1f}s.")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "running": sum(1 for job in self._jobs.values() if job.state == RUNNING),
+                **self._stats,
+            }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,229 @@
+import math
+import re
+import threading
+from collections import Counter
+
+from chroma_utils import COLLECTION_NAME, register_write_listener, with_collection
+
+# Only the schema documents written by populate_schema_in_chromadb are indexed
+LEXICAL_SOURCE = "ddl_parser"
+REBUILD_BATCH_SIZE = 5000
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+_IDENTIFIER_RE = re.compile(r"[a-z0-9_]+")
+_EXACT_QUERY_RE = re.compile(r"^\s*[\"'`]?([A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)?)[\"'`]?\s*$")
+
+
+def tokenize(text):
+    # Identifier-aware tokens: "pdgmeasurement_values" yields the whole identifier plus
+    # "pdgmeasurement" and "values", so both literal and partial names match.
+    tokens = []
+    for identifier in _IDENTIFIER_RE.findall(text.lower()):
+        tokens.append(identifier)
+        parts = [part for part in identifier.split("_") if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    # rankings: lists of ids, best first. Returns [(id, score)] sorted by fused score.
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class LexicalIndex:
+    # In-memory BM25 index over the schema documents, plus a name table for exact
+    # table/column identifier lookups. Kept in sync through record_collection_write.
+
+    def __init__(self):
+        self.ready = False
+        self._lock = threading.RLock()
+        self._docs = {}  # id -> (document, metadata, token counts, length)
+        self._postings = {}  # token -> {id: term frequency}
+        self._names = {}  # lowercased identifier -> set(ids)
+        self._total_length = 0
+        self._pending_writes = None  # writes seen while a rebuild is scanning the collection
+        self._generation = 0  # bumped by invalidate(), so a rebuild that was scanning is discarded
+
+    def rebuild(self, collection, batch_size=REBUILD_BATCH_SIZE):
+        # Returns False, leaving the index not ready, when the collection was reset during the
+        # scan: the snapshot may predate the reset.
+        with self._lock:
+            self._pending_writes = []
+            generation = self._generation
+        documents = []
+        offset = 0
+        while True:
+            batch = collection.get(
+                where={"source": LEXICAL_SOURCE}, include=["documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            documents.extend(zip(batch["ids"], batch["documents"], batch["metadatas"]))
+            if len(batch["ids"]) < batch_size:
+                break
+            offset += batch_size
+        with self._lock:
+            pending_writes, self._pending_writes = self._pending_writes, None
+            if self._generation != generation:
+                return False
+            self._docs, self._postings, self._names, self._total_length = {}, {}, {}, 0
+            for doc_id, document, metadata in documents:
+                self._add(doc_id, document, metadata)
+            # Replay writes that raced with the scan so they are not lost by the swap
+            for operation, args in pending_writes or ():
+                operation(*args)
+            self.ready = True
+            return True
+
+    def _name_keys(self, metadata):
+        table_name = str(metadata.get("table_name", "")).lower()
+        if metadata.get("type") == "table_schema":
+            return [table_name]
+        column_name = str(metadata.get("column_name", "")).lower()
+        return [column_name, f"{table_name}.{column_name}"]
+
+    def _add(self, doc_id, document, metadata):
+        metadata = metadata or {}
+        counts = Counter(tokenize(document or ""))
+        length = sum(counts.values())
+        self._docs[doc_id] = (document, metadata, counts, length)
+        self._total_length += length
+        for token, frequency in counts.items():
+            self._postings.setdefault(token, {})[doc_id] = frequency
+        for name in self._name_keys(metadata):
+            self._names.setdefault(name, set()).add(doc_id)
+
+    def _remove(self, doc_id):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        _, metadata, counts, length = entry
+        self._total_length -= length
+        for token in counts:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+        for name in self._name_keys(metadata):
+            ids = self._names.get(name)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._names[name]
+
+    def upsert(self, ids, documents, metadatas):
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((self.upsert, (ids, documents, metadatas)))
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                self._remove(doc_id)
+                if (metadata or {}).get("source") == LEXICAL_SOURCE:
+                    self._add(doc_id, document, metadata)
+
+    def delete(self, ids):
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((self.delete, (ids,)))
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._docs, self._postings, self._names, self._total_length = {}, {}, {}, 0
+            self.ready = False
+
+    @staticmethod
+    def _matches(metadata, filters):
+        return all(metadata.get(key) == value for key, value in (filters or {}).items())
+
+    def exact_lookup(self, query, filters=None):
+        # Ids for a query that is literally a table name, a column name or "table.column":
+        # the table document first, then its same-named columns ordered by table. None when the
+        # query is not a known identifier.
+        match = _EXACT_QUERY_RE.match(query)
+        if match is None:
+            return None
+        with self._lock:
+            ids = self._names.get(match.group(1).lower())
+            if not ids:
+                return None
+            entries = [(doc_id, self._docs[doc_id][1]) for doc_id in ids if self._matches(self._docs[doc_id][1], filters)]
+        entries.sort(key=lambda entry: (entry[1].get("type") != "table_schema", entry[1].get("table_name", ""), entry[0]))
+        return [doc_id for doc_id, _ in entries]
+
+    def search(self, query, limit, filters=None):
+        # BM25 ranking: [(id, score)] best first
+        query_tokens = set(tokenize(query))
+        with self._lock:
+            document_count = len(self._docs)
+            if not document_count or not query_tokens:
+                return []
+            average_length = self._total_length / document_count
+            scores = {}
+            for token in query_tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    length = self._docs[doc_id][3]
+                    denominator = frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / denominator
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            if filters:
+                ranked = [item for item in ranked if self._matches(self._docs[item[0]][1], filters)]
+            return ranked[:limit]
+
+    def get_documents(self, ids):
+        # {id: (document, metadata)} for the ids held by the index
+        with self._lock:
+            return {doc_id: self._docs[doc_id][:2] for doc_id in ids if doc_id in self._docs}
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._docs),
+                "tokens": len(self._postings),
+                "names": len(self._names),
+            }
+
+
+lexical_index = LexicalIndex()
+_rebuild_lock = threading.Lock()
+
+
+def get_lexical_index():
+    # The shared index, (re)built from the collection on first use or after a reset.
+    if not lexical_index.ready:
+        with _rebuild_lock:
+            # Repeated if a collection reset discarded the rebuild part way through
+            while not lexical_index.ready:
+                with_collection(lexical_index.rebuild)
+    return lexical_index
+
+
+def _on_collection_write(collection_name, upserted, deleted_ids, reset):
+    if collection_name != COLLECTION_NAME:
+        return
+    if reset:
+        lexical_index.invalidate()
+        return
+    if deleted_ids:
+        lexical_index.delete(deleted_ids)
+    if upserted:
+        if upserted.get("documents") is None:
+            # Without the text the new version cannot be indexed; rebuild on next use instead
+            lexical_index.invalidate()
+            return
+        lexical_index.upsert(upserted["ids"], upserted["documents"], upserted["metadatas"])
+
+
+register_write_listener(_on_collection_write)
@@ -0,0 +1,185 @@
+import threading
+
+from chroma_utils import COLLECTION_NAME, register_write_listener, with_collection
+
+# Metadata keys written by populate_schema_in_chromadb / ingest.py that filters use.
+INDEXED_METADATA_KEYS = ("type", "table_name", "column_name", "data_type", "source")
+REBUILD_BATCH_SIZE = 5000
+
+
+class UnsupportedFilterError(ValueError):
+    pass
+
+
+class InvalidFilterError(ValueError):
+    # The filter can never be valid (e.g. a list or object where a value is expected)
+    pass
+
+
+def _scalar_operand(key, value):
+    if not isinstance(value, (str, int, float, bool)):
+        raise InvalidFilterError(f"Filter values for '{key}' must be strings, numbers or booleans")
+    return value
+
+
+class MetadataIndex:
+    # Inverted index (key, value) -> set of ids over a fixed set of metadata keys.
+    # Answers equality / $in / $and / $or filters by set operations, without touching Chroma.
+
+    def __init__(self, keys=INDEXED_METADATA_KEYS):
+        self.keys = keys
+        self.ready = False
+        self._lock = threading.RLock()
+        self._postings = {}  # (key, value) -> set(ids)
+        self._doc_values = {}  # id -> tuple((key, value), ...)
+        self._pending_writes = None  # writes seen while a rebuild is scanning the collection
+        self._generation = 0  # bumped by invalidate(), so a rebuild that was scanning is discarded
+
+    def rebuild(self, collection, batch_size=REBUILD_BATCH_SIZE):
+        # Returns False, leaving the index not ready, when the collection was reset during the
+        # scan: the snapshot may predate the reset.
+        with self._lock:
+            self._pending_writes = []
+            generation = self._generation
+        postings = {}
+        doc_values = {}
+        offset = 0
+        while True:
+            batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            for doc_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                values = self._indexed_values(metadata)
+                doc_values[doc_id] = values
+                for posting_key in values:
+                    postings.setdefault(posting_key, set()).add(doc_id)
+            if len(batch["ids"]) < batch_size:
+                break
+            offset += batch_size
+        with self._lock:
+            pending_writes, self._pending_writes = self._pending_writes, None
+            if self._generation != generation:
+                return False
+            self._postings = postings
+            self._doc_values = doc_values
+            # Replay writes that raced with the scan so they are not lost by the swap
+            for operation, args in pending_writes or ():
+                operation(*args)
+            self.ready = True
+            return True
+
+    def _indexed_values(self, metadata):
+        metadata = metadata or {}
+        return tuple((key, metadata[key]) for key in self.keys if key in metadata)
+
+    def _remove(self, doc_id):
+        for posting_key in self._doc_values.pop(doc_id, ()):
+            ids = self._postings.get(posting_key)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[posting_key]
+
+    def upsert(self, ids, metadatas):
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((self.upsert, (ids, metadatas)))
+            for doc_id, metadata in zip(ids, metadatas):
+                self._remove(doc_id)
+                values = self._indexed_values(metadata)
+                self._doc_values[doc_id] = values
+                for posting_key in values:
+                    self._postings.setdefault(posting_key, set()).add(doc_id)
+
+    def delete(self, ids):
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((self.delete, (ids,)))
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._postings = {}
+            self._doc_values = {}
+            self.ready = False
+
+    def query(self, where):
+        # Sorted list of ids matching the filter; raises UnsupportedFilterError for filters the
+        # index cannot answer exactly (non-indexed keys, range operators, ...).
+        with self._lock:
+            return sorted(self._evaluate(where))
+
+    def _evaluate(self, where):
+        if not isinstance(where, dict) or not where:
+            raise UnsupportedFilterError("Filter must be a non-empty object")
+        if len(where) > 1:
+            # Chroma treats several top-level keys as an implicit $and
+            return self._evaluate({"$and": [{key: value} for key, value in where.items()]})
+
+        key, condition = next(iter(where.items()))
+        if key in ("$and", "$or"):
+            if not isinstance(condition, list) or not condition:
+                raise UnsupportedFilterError(f"{key} expects a non-empty list")
+            sets = [self._evaluate(sub_filter) for sub_filter in condition]
+            if key == "$or":
+                return set().union(*sets)
+            sets.sort(key=len)
+            result = set(sets[0])
+            for other in sets[1:]:
+                result &= other
+                if not result:
+                    break
+            return result
+
+        if key not in self.keys:
+            raise UnsupportedFilterError(f"Metadata key '{key}' is not indexed")
+        if isinstance(condition, dict):
+            if len(condition) != 1:
+                raise UnsupportedFilterError(f"Expected a single operator for '{key}'")
+            operator, operand = next(iter(condition.items()))
+            if operator == "$eq":
+                return set(self._postings.get((key, _scalar_operand(key, operand)), ()))
+            if operator == "$in":
+                if not isinstance(operand, list):
+                    raise InvalidFilterError("$in expects a list")
+                return set().union(*(self._postings.get((key, _scalar_operand(key, value)), set()) for value in operand))
+            raise UnsupportedFilterError(f"Operator {operator} is not supported by the metadata index")
+        return set(self._postings.get((key, _scalar_operand(key, condition)), ()))
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._doc_values),
+                "postings": len(self._postings),
+                "keys": list(self.keys),
+            }
+
+
+metadata_index = MetadataIndex()
+_rebuild_lock = threading.Lock()
+
+
+def get_metadata_index():
+    # The shared index, (re)built from the collection on first use or after a reset.
+    if not metadata_index.ready:
+        with _rebuild_lock:
+            # Repeated if a collection reset discarded the rebuild part way through
+            while not metadata_index.ready:
+                with_collection(metadata_index.rebuild)
+    return metadata_index
+
+
+def _on_collection_write(collection_name, upserted, deleted_ids, reset):
+    if collection_name != COLLECTION_NAME:
+        return
+    if reset:
+        metadata_index.invalidate()
+        return
+    if deleted_ids:
+        metadata_index.delete(deleted_ids)
+    if upserted:
+        metadata_index.upsert(upserted["ids"], upserted["metadatas"])
+
+
+register_write_listener(_on_collection_write)
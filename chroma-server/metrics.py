@@ -0,0 +1,245 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import has_request_context, request
+from flask.globals import request_ctx
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Add a Server-Timing header (per-stage durations) to every API response
+METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings for the current request live in the WSGI environ rather than flask.g, so they
+# are shared with views that the async serving mode runs in a copied request context. That
+# copy runs the teardown handlers when it is popped, so only the context that started the
+# request (recorded under _OWNER_ENVIRON_KEY) clears these keys.
+_TIMINGS_ENVIRON_KEY = "chroma_server.stage_timings"
+_STARTED_ENVIRON_KEY = "chroma_server.request_started"
+_OWNER_ENVIRON_KEY = "chroma_server.request_context"
+
+# Collection methods that are timed, and the request stage each one is reported under
+CHROMA_OPERATION_STAGES = {
+    "query": "ann_query", "get": "fetch", "count": "count", "peek": "fetch",
+    "add": "write", "upsert": "write", "update": "write", "delete": "write",
+}
+
+
+class Histogram:
+    # Cumulative-bucket histogram per label set. One lock and a bisect per observation keeps
+    # the cost at a few microseconds.
+
+    def __init__(self, name, documentation, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = [(labels, list(series)) for labels, series in sorted(self._series.items())]
+        for label_values, series in series_items:
+            labels = _format_labels(self.label_names, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_join_labels(labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_join_labels(labels, '+Inf')} {series[-1]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    # Monotonic counter per label set; also used as a gauge (metric_type="gauge") via inc(-1).
+
+    def __init__(self, name, documentation, label_names, metric_type="counter"):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.metric_type = metric_type
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{{{_format_labels(self.label_names, label_values)}}} {value}")
+        return lines
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values):
+    return ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values))
+
+
+def _join_labels(labels, bucket_bound):
+    bound = f'le="{bucket_bound}"'
+    return "{" + (labels + "," + bound if labels else bound) + "}"
+
+
+REQUEST_DURATION = Histogram(
+    "chroma_server_request_duration_seconds", "API request latency.", ("endpoint", "method", "status"))
+REQUESTS_TOTAL = Counter(
+    "chroma_server_requests_total", "API requests served.", ("endpoint", "method", "status"))
+REQUEST_ERRORS = Counter(
+    "chroma_server_request_errors_total", "API requests that ended with a 5xx status.", ("endpoint",))
+REQUESTS_IN_FLIGHT = Counter(
+    "chroma_server_requests_in_flight", "API requests currently being served.", ("endpoint",), metric_type="gauge")
+STAGE_DURATION = Histogram(
+    "chroma_server_stage_duration_seconds", "Time spent per request stage (embed, ann_query, fetch, serialize, ...).",
+    ("endpoint", "stage"))
+CHROMA_CALL_DURATION = Histogram(
+    "chroma_server_chroma_call_duration_seconds", "Latency of Chroma collection calls.", ("operation",))
+CHROMA_CALL_ERRORS = Counter(
+    "chroma_server_chroma_call_errors_total", "Chroma collection calls that raised.", ("operation",))
+ALL_METRICS = (
+    REQUEST_DURATION, REQUESTS_TOTAL, REQUEST_ERRORS, REQUESTS_IN_FLIGHT,
+    STAGE_DURATION, CHROMA_CALL_DURATION, CHROMA_CALL_ERRORS,
+)
+
+
+def _endpoint_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def record_stage(stage_name, seconds):
+    if not has_request_context():
+        return
+    STAGE_DURATION.observe(seconds, _endpoint_label(), stage_name)
+    timings = request.environ.get(_TIMINGS_ENVIRON_KEY)
+    if timings is not None:
+        timings.append((stage_name, seconds))
+
+
+@contextmanager
+def stage(stage_name):
+    # Time a block as one stage of the current request (no-op outside a request)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if METRICS_ENABLED:
+            record_stage(stage_name, time.perf_counter() - started)
+
+
+class InstrumentedCollection:
+    # Delegates to a chromadb Collection and times every data call. query_texts are embedded
+    # here with the collection's embedding function and passed on as query_embeddings, so the
+    # embedding and the ANN search show up as separate stages; results are unchanged.
+
+    def __init__(self, collection, embedding_function):
+        self._collection = collection
+        self._embedding_function = embedding_function
+
+    def __getattr__(self, attribute):
+        value = getattr(self._collection, attribute)
+        stage_name = CHROMA_OPERATION_STAGES.get(attribute)
+        if stage_name is None or not callable(value):
+            return value
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            except Exception:
+                CHROMA_CALL_ERRORS.inc(attribute)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                CHROMA_CALL_DURATION.observe(elapsed, attribute)
+                record_stage(stage_name, elapsed)
+        return timed
+
+    def query(self, *args, query_texts=None, **kwargs):
+        if query_texts is not None and self._embedding_function is not None:
+            started = time.perf_counter()
+            kwargs["query_embeddings"] = self._embedding_function.embed_query(list(query_texts))
+            elapsed = time.perf_counter() - started
+            CHROMA_CALL_DURATION.observe(elapsed, "embed")
+            record_stage("embed", elapsed)
+        elif query_texts is not None:
+            kwargs["query_texts"] = query_texts
+        return self.__getattr__("query")(*args, **kwargs)
+
+    def __repr__(self):
+        return f"InstrumentedCollection({self._collection!r})"
+
+
+def _before_request():
+    request.environ[_OWNER_ENVIRON_KEY] = id(request_ctx._get_current_object())
+    request.environ[_STARTED_ENVIRON_KEY] = time.perf_counter()
+    request.environ[_TIMINGS_ENVIRON_KEY] = []
+    REQUESTS_IN_FLIGHT.inc(_endpoint_label())
+
+
+def _after_request(response):
+    started = request.environ.get(_STARTED_ENVIRON_KEY)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = _endpoint_label()
+    status = str(response.status_code)
+    REQUEST_DURATION.observe(elapsed, endpoint, request.method, status)
+    REQUESTS_TOTAL.inc(endpoint, request.method, status)
+    if response.status_code >= 500:
+        REQUEST_ERRORS.inc(endpoint)
+    if METRICS_SERVER_TIMING:
+        totals = {}
+        for stage_name, seconds in request.environ.get(_TIMINGS_ENVIRON_KEY, ()):
+            totals[stage_name] = totals.get(stage_name, 0.0) + seconds
+        entries = [f"{stage_name};dur={seconds * 1000:.2f}" for stage_name, seconds in totals.items()]
+        entries.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+def _teardown_request(error=None):
+    if request.environ.get(_OWNER_ENVIRON_KEY) != id(request_ctx._get_current_object()):
+        return
+    request.environ.pop(_OWNER_ENVIRON_KEY, None)
+    request.environ.pop(_TIMINGS_ENVIRON_KEY, None)
+    if request.environ.pop(_STARTED_ENVIRON_KEY, None) is not None:
+        REQUESTS_IN_FLIGHT.inc(_endpoint_label(), amount=-1)
+
+
+def init_request_metrics(blueprint):
+    # Request count/latency/error/in-flight metrics for every route of the blueprint
+    if not METRICS_ENABLED:
+        return
+    blueprint.before_request(_before_request)
+    blueprint.after_request(_after_request)
+    blueprint.teardown_request(_teardown_request)
+
+
+def render_prometheus():
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,320 @@
+import os
+import threading
+
+import numpy as np
+
+from chroma_utils import COLLECTION_NAME, get_collection_space, register_write_listener, with_collection
+
+# "auto" serves schema vector search from the in-memory matrix while the schema has at most
+# NUMPY_SEARCH_MAX_DOCUMENTS documents, "numpy" always does, "chroma" never does.
+VECTOR_SEARCH_ENGINE = os.environ.get("VECTOR_SEARCH_ENGINE", "auto").lower()
+NUMPY_SEARCH_MAX_DOCUMENTS = int(os.environ.get("NUMPY_SEARCH_MAX_DOCUMENTS", 20000))
+# float16 halves the memory of the matrix; distances are still computed in float32
+NUMPY_SEARCH_DTYPE = np.dtype(os.environ.get("NUMPY_SEARCH_DTYPE", "float32"))
+# Same documents as the lexical index: the schema written by populate_schema_in_chromadb
+NUMPY_SEARCH_SOURCE = "ddl_parser"
+REBUILD_BATCH_SIZE = 5000
+
+
+class ExactVectorIndex:
+    # Exact (brute-force) nearest neighbours over the schema documents: embeddings are held in
+    # one contiguous matrix and every query is a single matrix product plus argpartition.
+    # Kept in sync through record_collection_write; upserts that arrive without embeddings
+    # are fetched from the collection before the next search.
+
+    def __init__(self, dtype=NUMPY_SEARCH_DTYPE):
+        self.ready = False
+        self.oversized = False  # more documents than NUMPY_SEARCH_MAX_DOCUMENTS at the last rebuild
+        self.space = "l2"
+        self._dtype = dtype
+        self._lock = threading.RLock()
+        self._reset()
+        self._pending_writes = None  # writes seen while a rebuild is scanning the collection
+        self._generation = 0  # bumped by invalidate(), so a rebuild that was scanning is discarded
+
+    def _reset(self):
+        self._ids = []
+        self._rows = {}  # id -> row in the matrix
+        self._documents = []
+        self._metadatas = []
+        self._matrix = None  # (capacity, dim); rows [0, len(self._ids)) are live
+        self._squared_norms = None
+        self._stale_ids = set()  # upserted without embeddings, to be fetched from the collection
+        self._masks = {}  # frozen filters -> row indices, cleared on every write
+
+    def __len__(self):
+        return len(self._ids)
+
+    def rebuild(self, collection, batch_size=REBUILD_BATCH_SIZE):
+        # Returns False, leaving the index not ready, when the collection was reset during the
+        # scan: the snapshot may predate the reset.
+        with self._lock:
+            self._pending_writes = []
+            generation = self._generation
+        # Distances use the collection's own space, so they match collection.query
+        space = get_collection_space(collection)
+        where = {"source": NUMPY_SEARCH_SOURCE}
+        total = len(collection.get(where=where, include=[])["ids"])
+        oversized = VECTOR_SEARCH_ENGINE == "auto" and total > NUMPY_SEARCH_MAX_DOCUMENTS
+        batches = []
+        offset = 0
+        while not oversized and offset < total:
+            batch = collection.get(
+                where=where, include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            batches.append(batch)
+            offset += len(batch["ids"])
+        with self._lock:
+            pending_writes, self._pending_writes = self._pending_writes, None
+            if self._generation != generation:
+                return False
+            self._reset()
+            self.space = space
+            self.oversized = oversized
+            for batch in batches:
+                self._set_rows(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"])
+            # Replay writes that raced with the scan so they are not lost by the swap
+            for operation, args in pending_writes or ():
+                operation(*args)
+            self.ready = True
+            return True
+
+    def _ensure_capacity(self, rows, dim):
+        if self._matrix is None:
+            self._matrix = np.zeros((max(rows, 64), dim), dtype=self._dtype)
+            self._squared_norms = np.zeros(len(self._matrix), dtype=np.float32)
+        elif self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the index dimension {self._matrix.shape[1]}")
+        elif rows > len(self._matrix):
+            capacity = max(rows, 2 * len(self._matrix))
+            matrix = np.zeros((capacity, dim), dtype=self._dtype)
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+            squared_norms = np.zeros(capacity, dtype=np.float32)
+            squared_norms[:len(self._ids)] = self._squared_norms[:len(self._ids)]
+            self._matrix, self._squared_norms = matrix, squared_norms
+
+    def _set_rows(self, ids, embeddings, documents, metadatas):
+        if not len(ids):
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        self._ensure_capacity(len(self._ids) + len(ids), vectors.shape[1])
+        for doc_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+            row = self._rows.get(doc_id)
+            if row is None:
+                row = self._rows[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._documents.append(document)
+                self._metadatas.append(metadata or {})
+            else:
+                self._documents[row] = document
+                self._metadatas[row] = metadata or {}
+            self._matrix[row] = vector
+            stored = self._matrix[row].astype(np.float32)
+            self._squared_norms[row] = stored @ stored
+            self._stale_ids.discard(doc_id)
+        self._masks = {}
+
+    def _remove(self, doc_id):
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        # Move the last row into the hole so live rows stay contiguous
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._documents[row] = self._documents[last]
+            self._metadatas[row] = self._metadatas[last]
+            self._matrix[row] = self._matrix[last]
+            self._squared_norms[row] = self._squared_norms[last]
+            self._rows[moved_id] = row
+        self._ids.pop()
+        self._documents.pop()
+        self._metadatas.pop()
+        self._masks = {}
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((self.upsert, (ids, documents, metadatas, embeddings)))
+            if self.oversized:
+                return
+            keep = []
+            for position, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+                if (metadata or {}).get("source") != NUMPY_SEARCH_SOURCE:
+                    self._remove(doc_id)
+                    self._stale_ids.discard(doc_id)
+                elif embeddings is None:
+                    # The collection computed the embedding; fetch it before the next search
+                    self._remove(doc_id)
+                    self._stale_ids.add(doc_id)
+                else:
+                    keep.append(position)
+            new_ids = {ids[i] for i in keep if ids[i] not in self._rows}
+            if VECTOR_SEARCH_ENGINE == "auto" and len(self._ids) + len(self._stale_ids) + len(new_ids) > NUMPY_SEARCH_MAX_DOCUMENTS:
+                # Grew past the threshold: hand search back to Chroma until the next rebuild
+                self._reset()
+                self.oversized = True
+                return
+            if keep:
+                self._set_rows(
+                    [ids[i] for i in keep], [embeddings[i] for i in keep],
+                    [documents[i] if documents is not None else None for i in keep], [metadatas[i] for i in keep]
+                )
+
+    def delete(self, ids):
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((self.delete, (ids,)))
+            for doc_id in ids:
+                self._remove(doc_id)
+                self._stale_ids.discard(doc_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._reset()
+            self.ready = False
+            self.oversized = False
+
+    def refresh(self, collection):
+        # Load the embeddings of documents upserted without them
+        with self._lock:
+            stale_ids = list(self._stale_ids)
+        if not stale_ids:
+            return
+        batch = collection.get(ids=stale_ids, include=["embeddings", "documents", "metadatas"])
+        with self._lock:
+            found = set(batch["ids"])
+            rows = [
+                i for i, doc_id in enumerate(batch["ids"])
+                if doc_id in self._stale_ids and (batch["metadatas"][i] or {}).get("source") == NUMPY_SEARCH_SOURCE
+            ]
+            self._set_rows(
+                [batch["ids"][i] for i in rows], [batch["embeddings"][i] for i in rows],
+                [batch["documents"][i] for i in rows], [batch["metadatas"][i] for i in rows]
+            )
+            # Deleted again (or never written) before the fetch
+            self._stale_ids.difference_update(doc_id for doc_id in stale_ids if doc_id not in found)
+
+    @property
+    def stale(self):
+        return bool(self._stale_ids)
+
+    def _candidate_rows(self, filters):
+        # Row indices whose metadata equals every filter value; None means all rows
+        if not filters:
+            return None
+        key = frozenset(filters.items())
+        rows = self._masks.get(key)
+        if rows is None:
+            rows = self._masks[key] = np.fromiter(
+                (row for row, metadata in enumerate(self._metadatas)
+                 if all(metadata.get(name) == value for name, value in filters.items())),
+                dtype=np.int64
+            )
+        return rows
+
+    def search(self, query_embeddings, n_results, filters=None):
+        # Exact top-k for a batch of queries: one [(id, distance)] list per query, nearest first,
+        # with distances as collection.query reports them for the collection's space.
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            rows = self._candidate_rows(filters)
+            count = len(self._ids)
+            if not count or n_results < 1 or (rows is not None and not len(rows)):
+                return [[] for _ in queries]
+            if rows is None:
+                matrix, squared_norms = self._matrix[:count], self._squared_norms[:count]
+            else:
+                matrix, squared_norms = self._matrix[rows], self._squared_norms[rows]
+            if matrix.dtype != np.float32:
+                matrix = matrix.astype(np.float32)
+            ids = self._ids
+
+            products = queries @ matrix.T
+            if self.space == "cosine":
+                norms = np.sqrt(squared_norms) * np.linalg.norm(queries, axis=1)[:, None]
+                distances = 1.0 - products / np.maximum(norms, 1e-12)
+            elif self.space == "ip":
+                distances = 1.0 - products
+            else:
+                distances = np.maximum(squared_norms[None, :] + np.einsum("ij,ij->i", queries, queries)[:, None] - 2.0 * products, 0.0)
+
+            k = min(n_results, distances.shape[1])
+            if k < distances.shape[1]:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(k), (len(queries), k))
+            top_distances = np.take_along_axis(distances, top, axis=1)
+            order = np.argsort(top_distances, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_distances = np.take_along_axis(top_distances, order, axis=1)
+            if rows is not None:
+                top = rows[top]
+            return [
+                [(ids[row], float(distance)) for row, distance in zip(query_rows, query_distances)]
+                for query_rows, query_distances in zip(top.tolist(), top_distances.tolist())
+            ]
+
+    def get_documents(self, ids):
+        # {id: (document, metadata)} for the ids held by the index
+        with self._lock:
+            return {
+                doc_id: (self._documents[self._rows[doc_id]], self._metadatas[self._rows[doc_id]])
+                for doc_id in ids if doc_id in self._rows
+            }
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "engine": VECTOR_SEARCH_ENGINE,
+                "ready": self.ready,
+                "active": self.ready and not self.oversized,
+                "documents": len(self._ids),
+                "stale": len(self._stale_ids),
+                "space": self.space,
+                "dtype": self._dtype.name,
+                "dim": None if self._matrix is None else self._matrix.shape[1],
+                "matrix_bytes": 0 if self._matrix is None else self._matrix.nbytes,
+                "max_documents": NUMPY_SEARCH_MAX_DOCUMENTS,
+            }
+
+
+numpy_index = ExactVectorIndex()
+_rebuild_lock = threading.Lock()
+
+
+def get_numpy_index():
+    # The shared index when it should serve schema vector search, otherwise None (engine set to
+    # "chroma", or "auto" with a schema larger than NUMPY_SEARCH_MAX_DOCUMENTS). An oversized
+    # index is re-evaluated when the collection is next reset.
+    if VECTOR_SEARCH_ENGINE == "chroma":
+        return None
+    if not numpy_index.ready:
+        with _rebuild_lock:
+            # Repeated if a collection reset discarded the rebuild part way through
+            while not numpy_index.ready:
+                with_collection(numpy_index.rebuild)
+    if numpy_index.oversized:
+        return None
+    if numpy_index.stale:
+        with_collection(numpy_index.refresh)
+    return numpy_index
+
+
+def _on_collection_write(collection_name, upserted, deleted_ids, reset):
+    if collection_name != COLLECTION_NAME:
+        return
+    if reset:
+        numpy_index.invalidate()
+        return
+    if deleted_ids:
+        numpy_index.delete(deleted_ids)
+    if upserted:
+        numpy_index.upsert(upserted["ids"], upserted.get("documents"), upserted["metadatas"], upserted.get("embeddings"))
+
+
+register_write_listener(_on_collection_write)
@@ -0,0 +1,108 @@
+import threading
+from collections import deque
+
+from schema_store import get_schema_snapshot, register_schema_listener
+
+
+class SchemaGraph:
+    # Foreign-key graph of the parsed schema. Edges and per-table adjacency are built once per
+    # schema snapshot; shortest join paths come from BFS trees memoized per source table.
+
+    def __init__(self, parsed_schemas):
+        self.tables = set(parsed_schemas)
+        self.references = {}  # table -> [edge] for its own foreign keys
+        self.referenced_by = {}  # table -> [edge] for foreign keys pointing at it
+        self._adjacent = {}  # table -> [(other table, edge)], both directions
+        for table_name, table_info in parsed_schemas.items():
+            for fk in table_info.get("foreign_keys", []):
+                edge = {
+                    "from_table": table_name,
+                    "from_columns": fk["columns"],
+                    "to_table": fk["references_table"],
+                    "to_columns": fk["references_columns"],
+                }
+                self.references.setdefault(table_name, []).append(edge)
+                self.referenced_by.setdefault(edge["to_table"], []).append(edge)
+                if edge["to_table"] != table_name:
+                    self._adjacent.setdefault(table_name, []).append((edge["to_table"], edge))
+                    self._adjacent.setdefault(edge["to_table"], []).append((table_name, edge))
+        self._bfs_trees = {}
+        self._lock = threading.Lock()
+
+    def neighbors(self, table_name):
+        # Tables one foreign key away, with the direction of the key
+        neighbors = [
+            {"table": edge["to_table"], "direction": "references", "edge": edge}
+            for edge in self.references.get(table_name, ())
+        ]
+        neighbors.extend(
+            {"table": edge["from_table"], "direction": "referenced_by", "edge": edge}
+            for edge in self.referenced_by.get(table_name, ())
+        )
+        return neighbors
+
+    def _bfs_tree(self, source):
+        tree = self._bfs_trees.get(source)
+        if tree is None:
+            tree = {source: None}  # table -> (previous table, edge)
+            queue = deque([source])
+            while queue:
+                table_name = queue.popleft()
+                for other, edge in self._adjacent.get(table_name, ()):
+                    if other not in tree:
+                        tree[other] = (table_name, edge)
+                        queue.append(other)
+            with self._lock:
+                tree = self._bfs_trees.setdefault(source, tree)
+        return tree
+
+    def join_path(self, source, target):
+        # Shortest list of FK edges joining source to target ([] when equal), or None if the
+        # tables are not connected. Edges may be traversed against their direction.
+        tree = self._bfs_tree(source)
+        if target not in tree:
+            return None
+        path = []
+        table_name = target
+        while tree[table_name] is not None:
+            previous, edge = tree[table_name]
+            path.append(edge)
+            table_name = previous
+        path.reverse()
+        return path
+
+    def get_stats(self):
+        return {
+            "tables": len(self.tables),
+            "edges": sum(len(edges) for edges in self.references.values()),
+            "memoized_sources": len(self._bfs_trees),
+        }
+
+
+def join_condition(edge):
+    return " AND ".join(
+        f"{edge['from_table']}.{column} = {edge['to_table']}.{ref_column}"
+        for column, ref_column in zip(edge["from_columns"], edge["to_columns"])
+    )
+
+
+_graph = None
+
+
+def _on_schema_refresh(snapshot):
+    global _graph
+    _graph = (snapshot.source_hash, SchemaGraph(snapshot.schema))
+
+
+register_schema_listener(_on_schema_refresh)
+
+
+def get_schema_graph():
+    # Graph for the current schema snapshot; rebuilt by the schema store when the DDL changes.
+    snapshot = get_schema_snapshot()
+    graph = _graph
+    if graph is None or graph[0] != snapshot.source_hash:
+        # The snapshot was built before this module registered its listener
+        _on_schema_refresh(snapshot)
+        graph = _graph
+    return graph[1]
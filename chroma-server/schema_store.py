@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import json
+import threading
+
+from chroma_utils import get_ddl_source, parse_ddl_statements
+
+try:
+    import brotli # Optional: enables "Content-Encoding: br" for schema responses
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are served uncompressed
+MIN_COMPRESS_BYTES = 512
+
+
+class EncodedPayload:
+    # A JSON body encoded once, with strong per-encoding ETags and lazily built compressed variants.
+
+    def __init__(self, data):
+        # sort_keys matches the ordering jsonify used for these responses before
+        self.body = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self._variants = {"identity": self.body}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        body = self._variants.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._variants.get(encoding)
+                if body is None:
+                    if encoding == "gzip":
+                        body = gzip.compress(self.body, compresslevel=9, mtime=0)
+                    elif encoding == "br" and brotli is not None:
+                        body = brotli.compress(self.body)
+                    else:
+                        raise ValueError(f"Unsupported encoding: {encoding}")
+                    self._variants[encoding] = body
+        return body
+
+    def etag_for(self, encoding):
+        # Each encoding has different bytes, so each gets its own strong ETag ("<hash>-gzip")
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+    def matches(self, if_none_match, encoding):
+        # If-None-Match holding the ETag of the variant about to be served. A cache holding another
+        # encoding's bytes must not be told its copy is current for this one.
+        return if_none_match.contains(self.etag_for(encoding))
+
+    def choose_encoding(self, accept_encoding):
+        # accept_encoding is werkzeug's request.accept_encodings
+        if len(self.body) < MIN_COMPRESS_BYTES:
+            return "identity"
+        if brotli is not None and accept_encoding["br"]:
+            return "br"
+        if accept_encoding["gzip"]:
+            return "gzip"
+        return "identity"
+
+
+class SchemaSnapshot:
+    # Parsed schema plus its pre-serialized payloads, for one version of the DDL source.
+
+    def __init__(self, source_hash, schema):
+        self.source_hash = source_hash
+        self.schema = schema
+        self.full = EncodedPayload(schema)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, table_name):
+        # Pre-serialized payload for a single table, or None if the table does not exist.
+        if table_name not in self.schema:
+            return None
+        payload = self._tables.get(table_name)
+        if payload is None:
+            with self._lock:
+                payload = self._tables.setdefault(table_name, EncodedPayload({table_name: self.schema[table_name]}))
+        return payload
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_refresh_listeners = []
+
+
+def register_schema_listener(listener):
+    # listener(snapshot) is called whenever a new schema snapshot is built.
+    if listener not in _refresh_listeners:
+        _refresh_listeners.append(listener)
+
+
+def get_schema_snapshot():
+    # Current snapshot; rebuilt only when the DDL source changes.
+    global _snapshot
+    source_hash, statements = get_ddl_source()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.source_hash == source_hash:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.source_hash != source_hash:
+            _snapshot = SchemaSnapshot(source_hash, parse_ddl_statements(statements))
+            for listener in list(_refresh_listeners):
+                listener(_snapshot)
+        return _snapshot
@@ -0,0 +1,162 @@
+import functools
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import copy_current_request_context, jsonify, request
+
+# "inline" runs API views on the request thread (previous behaviour); "async" runs views that
+# touch Chroma on a sized worker pool with a bounded queue, per-request deadlines and fast
+# 429/503 rejection.
+SERVING_MODE = os.environ.get("CHROMA_SERVING_MODE", "inline").lower()
+SERVING_WORKERS = int(os.environ.get("CHROMA_SERVING_WORKERS", 8))
+SERVING_QUEUE_SIZE = int(os.environ.get("CHROMA_SERVING_QUEUE_SIZE", 32))
+SERVING_DEADLINE_SECONDS = float(os.environ.get("CHROMA_SERVING_DEADLINE_SECONDS", 10))
+# Clients may ask for a shorter (never longer) deadline with this header, in milliseconds
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+
+class ServerSaturatedError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Chroma worker pool and queue are full")
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    # Thread pool with admission control: at most workers + queue_size tasks are admitted
+    # (running or waiting); anything beyond that is rejected immediately instead of queueing
+    # without bound. Tasks still waiting in the queue when their deadline passes are skipped.
+
+    def __init__(self, workers=SERVING_WORKERS, queue_size=SERVING_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chroma-serving")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._avg_task_seconds = 0.0  # EWMA of task run time, used for Retry-After
+        self._stats = {"completed": 0, "rejected": 0, "timed_out": 0, "expired_in_queue": 0}
+
+    def retry_after_seconds(self):
+        with self._lock:
+            waves = self._admitted / self.workers
+            return max(1, math.ceil(waves * self._avg_task_seconds))
+
+    def run(self, fn, deadline=None):
+        # Run fn on the pool and wait for its result until the absolute deadline
+        # (time.monotonic()), or without a limit when deadline is None.
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ServerSaturatedError(self.retry_after_seconds())
+        with self._lock:
+            self._admitted += 1
+
+        def task():
+            try:
+                if deadline is not None and time.monotonic() >= deadline:
+                    with self._lock:
+                        self._stats["expired_in_queue"] += 1
+                    raise DeadlineExceededError("Request deadline passed while queued")
+                with self._lock:
+                    self._running += 1
+                started = time.perf_counter()
+                try:
+                    return fn()
+                finally:
+                    elapsed = time.perf_counter() - started
+                    with self._lock:
+                        self._running -= 1
+                        self._stats["completed"] += 1
+                        self._avg_task_seconds += 0.2 * (elapsed - self._avg_task_seconds)
+            finally:
+                with self._lock:
+                    self._admitted -= 1
+                self._slots.release()
+
+        future = self._executor.submit(task)
+        try:
+            return future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # A running task cannot be interrupted; it finishes in the background and its slot
+            # stays taken until then, which is what keeps the pool from being oversubscribed.
+            future.cancel()
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise DeadlineExceededError("Request deadline exceeded")
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": self._running,
+                "queued": max(0, self._admitted - self._running),
+                "avg_task_seconds": self._avg_task_seconds,
+                **self._stats,
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor()
+    return _executor
+
+
+def request_deadline(default_seconds):
+    if default_seconds is None:
+        return None
+    seconds = default_seconds
+    header = request.headers.get(DEADLINE_HEADER)
+    if header:
+        try:
+            seconds = min(seconds, max(0.0, float(header) / 1000.0))
+        except ValueError:
+            pass
+    return time.monotonic() + seconds
+
+
+def bounded(deadline_seconds=SERVING_DEADLINE_SECONDS):
+    # View decorator: in async mode the view runs on the shared BoundedExecutor inside a copy of
+    # the request context. deadline_seconds=None admits the request without a deadline; it still
+    # counts against the pool and queue limits, so long-running work belongs on the job queue.
+    def decorator(view):
+        if SERVING_MODE != "async":
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            run_view = copy_current_request_context(lambda: view(*args, **kwargs))
+            try:
+                return get_executor().run(run_view, deadline=request_deadline(deadline_seconds))
+            except ServerSaturatedError as e:
+                response = jsonify({"error": "Server is busy, retry later.", "retry_after_seconds": e.retry_after})
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response, 429
+            except DeadlineExceededError as e:
+                response = jsonify({"error": "Request deadline exceeded.", "details": str(e)})
+                response.headers["Retry-After"] = str(get_executor().retry_after_seconds())
+                return response, 503
+        return wrapper
+    return decorator
+
+
+def get_serving_stats():
+    stats = {"mode": SERVING_MODE, "deadline_seconds": SERVING_DEADLINE_SECONDS}
+    if SERVING_MODE == "async":
+        stats["executor"] = get_executor().get_stats()
+    return stats
@@ -0,0 +1,290 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from chroma_utils import (
+    COLLECTION_NAME, get_chroma_client, get_collection, get_embedding_function, invalidate_collection,
+    is_missing_collection_error
+)
+from metrics import Histogram
+
+# "off" keeps everything in COLLECTION_NAME; "table" gives every table its own collection;
+# "hash" spreads tables over CHROMA_SHARD_COUNT collections by a hash of the table name.
+SHARDING_MODE = os.environ.get("CHROMA_SHARDING", "off").lower()
+SHARD_COUNT = int(os.environ.get("CHROMA_SHARD_COUNT", 16))
+SHARD_WORKERS = int(os.environ.get("CHROMA_SHARD_WORKERS", 8))
+SHARD_PREFIX = f"{COLLECTION_NAME}__"
+# Documents without a table_name metadata value
+DEFAULT_SHARD = f"{SHARD_PREFIX}default"
+
+_SHARD_NAME_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_-]+")
+
+SHARD_CALL_DURATION = Histogram(
+    "chroma_server_shard_call_duration_seconds", "Latency of Chroma calls per shard collection.", ("shard", "operation"))
+
+
+def shard_for_table(table_name):
+    if table_name is None:
+        return DEFAULT_SHARD
+    if SHARDING_MODE == "hash":
+        return f"{SHARD_PREFIX}h{zlib.crc32(str(table_name).encode('utf-8')) % SHARD_COUNT:03d}"
+    # Collection names only allow [A-Za-z0-9._-]; the digest keeps sanitized names distinct
+    safe_name = _SHARD_NAME_UNSAFE_RE.sub("_", str(table_name))[:48]
+    digest = hashlib.sha1(str(table_name).encode("utf-8")).hexdigest()[:8]
+    return f"{SHARD_PREFIX}t_{safe_name}_{digest}"
+
+
+def tables_in_filter(where):
+    # The set of table_name values a where filter restricts results to, or None when it does
+    # not restrict table_name (every shard must then be searched).
+    if not isinstance(where, dict) or not where:
+        return None
+    if len(where) > 1:
+        return tables_in_filter({"$and": [{key: value} for key, value in where.items()]})
+    key, condition = next(iter(where.items()))
+    if key == "$and" and isinstance(condition, list):
+        constrained = [tables for tables in map(tables_in_filter, condition) if tables is not None]
+        return set.intersection(*constrained) if constrained else None
+    if key == "$or" and isinstance(condition, list):
+        branches = [tables_in_filter(sub_filter) for sub_filter in condition]
+        return set().union(*branches) if branches and all(tables is not None for tables in branches) else None
+    if key != "table_name":
+        return None
+    if isinstance(condition, dict):
+        if "$eq" in condition:
+            return {condition["$eq"]}
+        if "$in" in condition and isinstance(condition["$in"], list):
+            return set(condition["$in"])
+        return None
+    return {condition}
+
+
+class ShardedCollection:
+    # Presents the shard collections as one collection with the subset of the chromadb
+    # Collection API this server uses (count/get/query/add/upsert/delete). Writes are routed
+    # by metadata table_name; reads fan out in parallel to the shards a filter can match.
+
+    def __init__(self, executor):
+        self.name = COLLECTION_NAME
+        self.id = f"sharded:{SHARDING_MODE}"
+        self._executor = executor
+        self._shards = None  # names of existing shard collections
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}  # shard -> {"calls", "seconds", "max_seconds", "last_seconds"}
+
+    @property
+    def metadata(self):
+        return {"sharding": SHARDING_MODE, "shards": len(self.shard_names())}
+
+    def shard_names(self):
+        shards = self._shards
+        if shards is None:
+            with self._lock:
+                if self._shards is None:
+                    collections = get_chroma_client().list_collections()
+                    names = [getattr(collection, "name", collection) for collection in collections]
+                    self._shards = {name for name in names if name.startswith(SHARD_PREFIX)}
+                shards = self._shards
+        return sorted(shards)
+
+    def forget_shards(self):
+        with self._lock:
+            self._shards = None
+
+    def _call_shard(self, shard, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            try:
+                return getattr(get_collection(shard), operation)(*args, **kwargs)
+            except Exception as e:
+                if not is_missing_collection_error(e):
+                    raise
+                invalidate_collection(shard)
+                return getattr(get_collection(shard), operation)(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            SHARD_CALL_DURATION.observe(elapsed, shard, operation)
+            with self._stats_lock:
+                stats = self._stats.setdefault(shard, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0})
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+                stats["last_seconds"] = elapsed
+
+    def _fan_out(self, shards, operation, *args, **kwargs):
+        # [(shard, result)] in shard order; calls run on the shared pool
+        futures = [(shard, self._executor.submit(self._call_shard, shard, operation, *args, **kwargs)) for shard in shards]
+        return [(shard, future.result()) for shard, future in futures]
+
+    def _target_shards(self, where):
+        shards = self.shard_names()
+        tables = tables_in_filter(where)
+        if tables is None:
+            return shards
+        # Shards that the table_name filter excludes are never queried
+        wanted = {shard_for_table(table_name) for table_name in tables}
+        return [shard for shard in shards if shard in wanted]
+
+    def count(self):
+        return sum(result for _, result in self._fan_out(self.shard_names(), "count"))
+
+    def _write(self, operation, ids, embeddings=None, metadatas=None, documents=None):
+        groups = {}
+        for position, metadata in enumerate(metadatas or [None] * len(ids)):
+            groups.setdefault(shard_for_table((metadata or {}).get("table_name")), []).append(position)
+        with self._lock:
+            new_shards = set(groups) - (self._shards or set())
+            if self._shards is not None:
+                self._shards |= new_shards
+
+        def pick(values, positions):
+            return None if values is None else [values[position] for position in positions]
+
+        futures = [
+            self._executor.submit(
+                self._call_shard, shard, operation, ids=pick(ids, positions), embeddings=pick(embeddings, positions),
+                metadatas=pick(metadatas, positions), documents=pick(documents, positions)
+            )
+            for shard, positions in groups.items()
+        ]
+        for future in futures:
+            future.result()
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        self._write("upsert", ids, embeddings, metadatas, documents)
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        self._write("add", ids, embeddings, metadatas, documents)
+
+    def delete(self, ids=None, where=None, where_document=None):
+        # Ids do not say which shard holds them, so id deletes go to every shard
+        shards = self.shard_names() if ids is not None else self._target_shards(where)
+        self._fan_out(shards, "delete", ids=ids, where=where, where_document=where_document)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, where_document=None, include=("metadatas", "documents")):
+        include = list(include)
+        shards = self.shard_names() if ids is not None else self._target_shards(where)
+        merged = {"ids": [], **{field: [] for field in include}}
+
+        def extend(result):
+            merged["ids"].extend(result["ids"])
+            for field in include:
+                merged[field].extend(list(result[field]) if result.get(field) is not None else [None] * len(result["ids"]))
+
+        if ids is not None:
+            for _, result in self._fan_out(shards, "get", ids=ids, where=where, where_document=where_document, include=include):
+                extend(result)
+            # Return rows in the order the ids were asked for, like a single collection does
+            positions = {doc_id: i for i, doc_id in enumerate(merged["ids"])}
+            order = [positions[doc_id] for doc_id in dict.fromkeys(ids) if doc_id in positions]
+            ordered = {field: [values[i] for i in order] for field, values in merged.items()}
+            return self._page(ordered, offset, limit)
+
+        offset = offset or 0
+        if where is None and where_document is None:
+            # Unfiltered pages map onto exact per-shard ranges using the shard counts
+            counts = self._fan_out(shards, "count")
+            for shard, shard_count in counts:
+                if limit is not None and len(merged["ids"]) >= limit:
+                    break
+                if offset >= shard_count:
+                    offset -= shard_count
+                    continue
+                remaining = None if limit is None else limit - len(merged["ids"])
+                extend(self._call_shard(shard, "get", limit=remaining, offset=offset, include=include))
+                offset = 0
+            return merged
+
+        # Filtered pages: take up to offset + limit matches from each shard, in shard order
+        window = None if limit is None else offset + limit
+        for _, result in self._fan_out(shards, "get", where=where, where_document=where_document, limit=window, include=include):
+            extend(result)
+        return self._page(merged, offset, limit)
+
+    @staticmethod
+    def _page(result, offset, limit):
+        start = offset or 0
+        end = None if limit is None else start + limit
+        return {field: values[start:end] for field, values in result.items()}
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, where_document=None,
+              include=("metadatas", "documents", "distances")):
+        include = list(include)
+        if query_embeddings is None:
+            # Embed once here rather than once per shard
+            query_embeddings = get_embedding_function().embed_query(list(query_texts))
+        shard_include = include if "distances" in include else include + ["distances"]
+        shard_results = self._fan_out(
+            self._target_shards(where), "query", query_embeddings=query_embeddings, n_results=n_results,
+            where=where, where_document=where_document, include=shard_include
+        )
+        merged = {"ids": [], **{field: [] for field in include}}
+        for query_index in range(len(query_embeddings)):
+            # Top-k merge across shards by distance
+            candidates = []
+            for shard_position, (_, result) in enumerate(shard_results):
+                for position, distance in enumerate(result["distances"][query_index]):
+                    candidates.append((distance, shard_position, position))
+            candidates.sort()
+            top = candidates[:n_results]
+            merged["ids"].append([shard_results[s][1]["ids"][query_index][p] for _, s, p in top])
+            for field in include:
+                merged[field].append([
+                    shard_results[s][1][field][query_index][p] if shard_results[s][1].get(field) is not None else None
+                    for _, s, p in top
+                ])
+        return merged
+
+    def get_shard_stats(self):
+        with self._stats_lock:
+            stats = {shard: dict(values) for shard, values in self._stats.items()}
+        shards = []
+        for shard in self.shard_names():
+            entry = {"name": shard, **stats.get(shard, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0})}
+            entry["avg_seconds"] = entry["seconds"] / entry["calls"] if entry["calls"] else 0.0
+            shards.append(entry)
+        return shards
+
+
+_executor = None
+_sharded_collection = None
+_sharded_lock = threading.Lock()
+
+
+def sharding_enabled():
+    return SHARDING_MODE in ("table", "hash")
+
+
+def get_sharded_collection():
+    global _executor, _sharded_collection
+    if _sharded_collection is None:
+        with _sharded_lock:
+            if _sharded_collection is None:
+                _executor = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="chroma-shard")
+                _sharded_collection = ShardedCollection(_executor)
+    return _sharded_collection
+
+
+def delete_shards():
+    client = get_chroma_client()
+    sharded_collection = get_sharded_collection()
+    for shard in sharded_collection.shard_names():
+        client.delete_collection(name=shard)
+        invalidate_collection(shard)
+    sharded_collection.forget_shards()
+
+
+def get_sharding_stats():
+    if not sharding_enabled():
+        return {"mode": SHARDING_MODE}
+    sharded_collection = get_sharded_collection()
+    shards = sharded_collection.get_shard_stats()
+    counts = dict(sharded_collection._fan_out([shard["name"] for shard in shards], "count"))
+    for shard in shards:
+        shard["count"] = counts.get(shard["name"], 0)
+    return {"mode": SHARDING_MODE, "shard_count": SHARD_COUNT if SHARDING_MODE == "hash" else None, "shards": shards}
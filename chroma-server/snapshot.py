@@ -0,0 +1,255 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+from chroma_utils import (
+    CHROMA_DATA_PATH, COLLECTION_NAME, delete_collection, get_chroma_client, get_collection, get_collection_space,
+    get_collection_version, get_particles_collection, is_missing_collection_error, record_collection_write
+)
+
+SNAPSHOT_DIR = os.path.join(CHROMA_DATA_PATH, "snapshots")
+SNAPSHOT_BATCH_SIZE = int(os.environ.get("SNAPSHOT_BATCH_SIZE", 5000))
+SNAPSHOT_FORMAT_VERSION = 2
+# Version 1 manifests carry no collection config; they import with the target's defaults
+_SUPPORTED_FORMAT_VERSIONS = (1, 2)
+
+_SNAPSHOT_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+# Layout of a snapshot directory:
+#   manifest.json    counts, embedding dimension, distance space, HNSW config and metadata of
+#                    the source collection, and its version
+#   embeddings.npy   float32 (count, dim) matrix, memory-mapped on import
+#   ids.jsonl, documents.jsonl, metadatas.jsonl   one JSON value per line, row-aligned
+
+
+def snapshot_path(name):
+    # Snapshots can only live directly under SNAPSHOT_DIR
+    if not isinstance(name, str) or not _SNAPSHOT_NAME_RE.match(name):
+        raise ValueError(f"Invalid snapshot name '{name}': use letters, digits, '_', '.' and '-'")
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def _batch_size(requested):
+    return max(1, min(requested, get_chroma_client().get_max_batch_size()))
+
+
+def export_snapshot(name, collection=None, batch_size=SNAPSHOT_BATCH_SIZE, progress_callback=None):
+    if collection is None:
+        collection = get_particles_collection()
+    path = snapshot_path(name)
+    if os.path.exists(path):
+        raise FileExistsError(f"Snapshot '{name}' already exists")
+    batch_size = _batch_size(batch_size)
+    started = time.perf_counter()
+    version = get_collection_version(collection.name)
+    count = collection.count()
+
+    # Written to a temporary directory and renamed at the end, so a snapshot is never half-written
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    embeddings = None
+    rows = 0
+    try:
+        with open(os.path.join(tmp_path, "ids.jsonl"), "w") as ids_file, \
+                open(os.path.join(tmp_path, "documents.jsonl"), "w") as documents_file, \
+                open(os.path.join(tmp_path, "metadatas.jsonl"), "w") as metadatas_file:
+            while rows < count:
+                batch = collection.get(
+                    include=["embeddings", "documents", "metadatas"], limit=min(batch_size, count - rows), offset=rows
+                )
+                if not batch["ids"]:
+                    break
+                vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+                if embeddings is None:
+                    embeddings = np.lib.format.open_memmap(
+                        os.path.join(tmp_path, "embeddings.npy"), mode="w+", dtype=np.float32, shape=(count, vectors.shape[1])
+                    )
+                embeddings[rows:rows + len(vectors)] = vectors
+                for doc_id, document, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                    ids_file.write(json.dumps(doc_id) + "\n")
+                    documents_file.write(json.dumps(document) + "\n")
+                    metadatas_file.write(json.dumps(metadata) + "\n")
+                rows += len(batch["ids"])
+                if progress_callback is not None:
+                    progress_callback(rows, count)
+
+        dim = 0 if embeddings is None else embeddings.shape[1]
+        if embeddings is not None:
+            embeddings.flush()
+            if rows < count:
+                # Documents were deleted while exporting; shrink the matrix to the rows written
+                trimmed = np.array(embeddings[:rows])
+                del embeddings
+                np.save(os.path.join(tmp_path, "embeddings.npy"), trimmed)
+            else:
+                del embeddings
+        else:
+            np.save(os.path.join(tmp_path, "embeddings.npy"), np.zeros((0, 0), dtype=np.float32))
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "name": name,
+            "collection": collection.name,
+            "count": rows,
+            "dim": dim,
+            "dtype": "float32",
+            "space": get_collection_space(collection),
+            "hnsw": _hnsw_configuration(collection),
+            "metadata": collection.metadata,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "collection_version": version,
+            # False when the collection was written to while the snapshot was taken
+            "consistent": get_collection_version(collection.name) == version,
+        }
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    seconds = time.perf_counter() - started
+    return {**manifest, "path": path, "seconds": seconds}
+
+
+def _hnsw_configuration(collection):
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw = configuration.get("hnsw")
+    return dict(hnsw) if hnsw else None
+
+
+def _existing_collection(name):
+    # The collection if it exists, without creating it with the default configuration
+    from sharding import sharding_enabled
+    if name == COLLECTION_NAME and sharding_enabled():
+        return get_collection(name)
+    try:
+        get_chroma_client().get_collection(name=name)
+    except Exception as e:
+        if is_missing_collection_error(e):
+            return None
+        raise
+    return get_collection(name)
+
+
+def _check_importable(name, manifest, embeddings, target):
+    # Raises ValueError if the snapshot cannot be loaded into target (None: to be created)
+    if manifest["count"] and embeddings.shape != (manifest["count"], manifest["dim"]):
+        raise ValueError(
+            f"Snapshot '{name}' is inconsistent: embeddings.npy has shape {embeddings.shape}, "
+            f"the manifest expects ({manifest['count']}, {manifest['dim']})"
+        )
+    if target is None:
+        return
+    space = manifest.get("space")
+    if space is not None and get_collection_space(target) != space:
+        raise ValueError(
+            f"Snapshot '{name}' uses the '{space}' space but collection '{target.name}' uses "
+            f"'{get_collection_space(target)}'; import it with replace"
+        )
+    existing = target.get(limit=1, include=["embeddings"])["embeddings"]
+    if manifest["count"] and len(existing) and len(existing[0]) != manifest["dim"]:
+        raise ValueError(
+            f"Snapshot '{name}' has {manifest['dim']}-dimensional embeddings but collection "
+            f"'{target.name}' holds {len(existing[0])}-dimensional ones; import it with replace"
+        )
+
+
+def read_manifest(name):
+    with open(os.path.join(snapshot_path(name), "manifest.json")) as f:
+        return json.load(f)
+
+
+def import_snapshot(name, collection=None, batch_size=SNAPSHOT_BATCH_SIZE, replace=False, progress_callback=None):
+    # Bulk-load a snapshot with its stored embeddings (no model inference). replace=True empties
+    # the target collection first; otherwise snapshot rows are upserted over existing ones.
+    # Everything is validated before the collection is touched, so a rejected snapshot leaves
+    # it as it was. A collection created here gets the snapshot's space, HNSW config and metadata.
+    path = snapshot_path(name)
+    manifest = read_manifest(name)
+    if manifest.get("format_version") not in _SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported snapshot format version {manifest.get('format_version')}")
+    target_name = collection.name if collection is not None else COLLECTION_NAME
+    if collection is None and not replace:
+        collection = _existing_collection(target_name)
+    embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+    _check_importable(name, manifest, embeddings, None if replace else collection)
+
+    if replace:
+        try:
+            delete_collection(target_name)
+        except Exception as e:
+            if not is_missing_collection_error(e):
+                raise
+        collection = None
+    if collection is None:
+        configuration = {"hnsw": manifest["hnsw"]} if manifest.get("hnsw") else None
+        collection = get_collection(target_name, metadata=manifest.get("metadata") or None, configuration=configuration)
+    batch_size = _batch_size(batch_size)
+    started = time.perf_counter()
+
+    rows = 0
+    with open(os.path.join(path, "ids.jsonl")) as ids_file, \
+            open(os.path.join(path, "documents.jsonl")) as documents_file, \
+            open(os.path.join(path, "metadatas.jsonl")) as metadatas_file:
+        while rows < manifest["count"]:
+            size = min(batch_size, manifest["count"] - rows)
+            upserted = {
+                "ids": [json.loads(next(ids_file)) for _ in range(size)],
+                "documents": [json.loads(next(documents_file)) for _ in range(size)],
+                "metadatas": [json.loads(next(metadatas_file)) for _ in range(size)],
+                "embeddings": np.ascontiguousarray(embeddings[rows:rows + size]),
+            }
+            collection.upsert(**upserted)
+            record_collection_write(collection.name, upserted=upserted)
+            rows += size
+            if progress_callback is not None:
+                progress_callback(rows, manifest["count"])
+
+    seconds = time.perf_counter() - started
+    return {"name": name, "documents": rows, "seconds": seconds, "docs_per_second": rows / seconds if seconds else 0.0}
+
+
+def list_snapshots():
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(SNAPSHOT_DIR)):
+        if _SNAPSHOT_NAME_RE.match(name) and os.path.exists(os.path.join(SNAPSHOT_DIR, name, "manifest.json")):
+            snapshots.append(read_manifest(name))
+    return snapshots
+
+
+def default_snapshot_name():
+    return datetime.datetime.now(datetime.timezone.utc).strftime(f"{COLLECTION_NAME}-%Y%m%dT%H%M%SZ")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export or import collection snapshots (ids, embeddings, documents, metadata).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("name", nargs="?", default=None)
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("name")
+    import_parser.add_argument("--replace", action="store_true", help="Empty the collection before importing")
+    subparsers.add_parser("list")
+    for sub_parser in (export_parser, import_parser):
+        sub_parser.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        result = export_snapshot(args.name or default_snapshot_name(), batch_size=args.batch_size)
+        print(f"Exported {result['count']} documents to {result['path']} in {result['seconds']:.1f}s")
+    elif args.command == "import":
+        result = import_snapshot(args.name, batch_size=args.batch_size, replace=args.replace)
+        print(f"Imported {result['documents']} documents in {result['seconds']:.1f}s ({result['docs_per_second']:.0f} docs/s)")
+    else:
+        for manifest in list_snapshots():
+            print(f"{manifest['name']}: {manifest['count']} documents, dim {manifest['dim']}, created {manifest['created_at']}")
@@ -0,0 +1,35 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+# Modules read their settings at import time, so point them at a throwaway data directory before
+# any test imports them; the checked-in chroma_data/ is never touched.
+os.environ.setdefault("CHROMA_DATA_PATH", tempfile.mkdtemp(prefix="chroma_server_tests_"))
+os.environ.setdefault("CHROMA_WARM_UP", "off")
+
+
+def _hashed_embeddings(self, input):
+    # Bag-of-words vectors from token hashes: deterministic, and related texts stay close.
+    vectors = []
+    for text in input:
+        vector = np.zeros(384, dtype=np.float32)
+        for token in text.lower().replace(".", " ").replace(",", " ").split():
+            vector[int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") % 384] += 1.0
+        vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+    return vectors
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    # Stands in for the ONNX model so tests never download or run it.
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+    monkeypatch.setattr(DefaultEmbeddingFunction, "__call__", _hashed_embeddings)
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def loaded_client(client, fake_embeddings):
+    # The bundled schema in the default collection; reloading an unchanged schema writes nothing.
+    assert client.post("/api/schema/load_to_chroma?wait=1").status_code == 200
+    return client
+
+
+def test_load_is_queued_as_a_job(loaded_client):
+    response = loaded_client.post("/api/schema/load_to_chroma")
+
+    assert response.status_code == 202
+    job = loaded_client.get(response.headers["Location"]).get_json()
+    assert job["id"] == response.get_json()["job_id"]
+    assert job["kind"] == "schema_load"
+
+
+def test_schema_search_exact_identifier_and_result_cache(loaded_client):
+    exact = loaded_client.get("/api/schema/search?q=pdgid.description").get_json()
+    assert exact["served_by"] == "exact"
+    assert exact["results"][0]["id"] == "col_schema_pdgid_description"
+
+    first = loaded_client.get("/api/schema/search?q=branching ratio of a decay").get_json()
+    second = loaded_client.get("/api/schema/search?q=branching ratio of a decay").get_json()
+    assert second["cached"] is True
+    assert [result["id"] for result in second["results"]] == [result["id"] for result in first["results"]]
+
+
+def test_query_by_id_etags(loaded_client):
+    doc_id = "col_schema_pdgid_description"
+    response = loaded_client.get(f"/api/vectors/query_by_id/{doc_id}")
+    etag = response.headers["ETag"]
+
+    assert loaded_client.get(f"/api/vectors/query_by_id/{doc_id}", headers={"If-None-Match": etag}).status_code == 304
+    batch = loaded_client.post("/api/vectors/query_by_id", json={
+        "ids": [doc_id, "col_schema_pdgid_pdgid", "missing-id"], "if_none_match": {doc_id: etag.strip('"')},
+    }).get_json()
+    assert batch["not_modified"] == [doc_id]
+    assert [item["id"] for item in batch["items"]] == ["col_schema_pdgid_pdgid"]
+    assert batch["missing"] == ["missing-id"]
+
+
+def test_query_by_metadata_uses_the_index(loaded_client):
+    body = loaded_client.post("/api/vectors/query_by_metadata", json={
+        "where": {"$and": [{"table_name": "pdgid"}, {"type": "column_schema"}]}, "limit": 3,
+    }).get_json()
+
+    assert body["served_by"] == "metadata_index"
+    assert body["total"] > 3 and len(body["items"]) == 3
+    assert all(item["metadata"]["table_name"] == "pdgid" for item in body["items"])
+    invalid = loaded_client.post("/api/vectors/query_by_metadata", json={"where": {"table_name": ["pdgid"]}})
+    assert invalid.status_code == 400
+
+
+def test_search_content_pages_with_a_cursor_and_streams(loaded_client):
+    first = loaded_client.post("/api/vectors/search_content", json={"query": "particle mass", "n_results": 5}).get_json()
+    second = loaded_client.post("/api/vectors/search_content", json={"cursor": first["next_cursor"], "n_results": 5}).get_json()
+    first_ids = [item["id"] for item in first["results"][0]["items"]]
+    second_ids = [item["id"] for item in second["results"][0]["items"]]
+
+    assert len(first_ids) == len(second_ids) == 5
+    assert not set(first_ids) & set(second_ids)
+
+    streamed = loaded_client.post("/api/vectors/search_content", json={"query": "particle mass", "n_results": 5, "stream": True})
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert [line["id"] for line in lines[:-1]] == first_ids
+    assert "next_cursor" in lines[-1]
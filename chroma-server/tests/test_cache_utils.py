@@ -0,0 +1,26 @@
+from cache_utils import LRUTTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUTTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_stale_version_and_expired_entries_are_misses():
+    cache = LRUTTLCache()
+    cache.set("results", [1, 2], version=7)
+    assert cache.get("results", version=7) == [1, 2]
+    assert cache.get("results", version=8) is None  # the collection was written to since
+    assert cache.get("results", version=7) is None
+
+    expired = LRUTTLCache(ttl_seconds=-1)
+    expired.set("results", [1])
+    assert expired.get("results") is None
+    assert expired.get_stats()["expirations"] == 1
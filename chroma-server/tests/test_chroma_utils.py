@@ -0,0 +1,43 @@
+from chroma_utils import (
+    get_collection, invalidate_collection, parse_ddl_statements, populate_schema_in_chromadb
+)
+
+DDL = [
+    "CREATE TABLE item (id INTEGER NOT NULL, name VARCHAR(64) DEFAULT 'a,b', PRIMARY KEY (id), UNIQUE (name))",
+    'CREATE TABLE "order items" (id INTEGER PRIMARY KEY, item_id INTEGER REFERENCES item (id), '
+    "price NUMERIC(10, 2) CHECK (price > 0))",
+]
+
+
+def test_parser_handles_quoted_names_and_inline_clauses():
+    schema = parse_ddl_statements(DDL)
+
+    assert schema["item"]["primary_key"] == ["id"]
+    assert schema["item"]["unique_constraints"] == [["name"]]
+    assert schema["item"]["columns"][1] == {"name": "name", "type": "VARCHAR(64)", "default": "'a,b'"}
+    order_items = schema["order items"]
+    assert [column["type"] for column in order_items["columns"]] == ["INTEGER", "INTEGER", "NUMERIC(10, 2)"]
+    assert order_items["foreign_keys"][0]["references_table"] == "item"
+
+
+def test_schema_sync_only_writes_what_changed(fake_embeddings):
+    collection = get_collection("schema-sync-test")
+    schema = parse_ddl_statements(DDL)
+
+    first = populate_schema_in_chromadb(collection=collection, parsed_schemas=schema)
+    again = populate_schema_in_chromadb(collection=collection, parsed_schemas=schema)
+    shrunk = populate_schema_in_chromadb(collection=collection, parsed_schemas={"item": schema["item"]})
+
+    assert first["added"] == first["documents"] and first["unchanged"] == 0
+    assert again["unchanged"] == again["documents"] and again["added"] == again["changed"] == 0
+    assert shrunk["removed"] == first["documents"] - shrunk["documents"]
+    assert collection.count() == shrunk["documents"]
+
+
+def test_collection_handles_are_shared_until_invalidated(fake_embeddings):
+    handle = get_collection("handle-registry-test")
+    assert get_collection("handle-registry-test") is handle
+
+    invalidate_collection("handle-registry-test")
+
+    assert get_collection("handle-registry-test") is not handle
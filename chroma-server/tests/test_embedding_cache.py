@@ -0,0 +1,61 @@
+import numpy as np
+
+from embedding_cache import CachedEmbeddingFunction, EmbeddingStore
+
+
+class CountingModel:
+    # Stand-in for the ONNX model that records how many texts it embedded.
+
+    def __init__(self):
+        self.embedded = []
+
+    @staticmethod
+    def name():
+        return "counting"
+
+    def __call__(self, input):
+        self.embedded.extend(input)
+        return [np.full(4, len(text), dtype=np.float32) for text in input]
+
+    def embed_query(self, input):
+        return self(input)
+
+
+def test_documents_persist_across_restarts(tmp_path):
+    model = CountingModel()
+    CachedEmbeddingFunction(model, EmbeddingStore(str(tmp_path)))(["alpha", "beta"])
+
+    restarted = CachedEmbeddingFunction(model, EmbeddingStore(str(tmp_path)))
+    vectors = restarted(["beta", "alpha", "gamma"])
+
+    assert model.embedded == ["alpha", "beta", "gamma"]
+    assert [vector[0] for vector in vectors] == [4, 5, 5]
+
+
+def test_torn_tail_is_dropped_on_load(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many([b"k" * 16], [np.ones(4, dtype=np.float32)])
+    with open(tmp_path / "embeddings.bin", "ab") as f:
+        f.write(b"\0" * 7)  # half of a record from an interrupted append
+
+    reloaded = EmbeddingStore(str(tmp_path))
+
+    assert len(reloaded) == 1
+    assert (tmp_path / "embeddings.bin").stat().st_size == reloaded._dtype.itemsize
+    assert reloaded.get_many([b"k" * 16])[0].tolist() == [1.0] * 4
+
+
+def test_queries_are_cached_in_memory_only(tmp_path):
+    model = CountingModel()
+    store = EmbeddingStore(str(tmp_path))
+    embedding_function = CachedEmbeddingFunction(model, store, query_cache_size=2)
+    embedding_function(["indexed document"])
+
+    embedding_function.embed_query(["indexed document", "user query"])
+    embedding_function.embed_query(["user query"])
+
+    # The document vector comes from the store, the repeated query from the LRU; neither
+    # query adds a record to the persistent store.
+    assert model.embedded == ["indexed document", "user query"]
+    assert len(store) == 1
+    assert embedding_function.get_stats()["query_cache"]["size"] == 2
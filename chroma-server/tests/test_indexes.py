@@ -0,0 +1,82 @@
+import pytest
+
+from lexical_index import LexicalIndex
+from metadata_index import InvalidFilterError, MetadataIndex
+from numpy_search import ExactVectorIndex
+
+
+class FakeCollection:
+    # Serves every record from each get(); on_get runs before the first one is answered.
+
+    metadata = None
+    configuration = None
+
+    def __init__(self, records, on_get=None):
+        self.records = records
+        self.on_get = on_get
+
+    def get(self, **kwargs):
+        if self.on_get is not None:
+            on_get, self.on_get = self.on_get, None
+            on_get()
+        return {
+            "ids": [record[0] for record in self.records],
+            "documents": [record[1] for record in self.records],
+            "metadatas": [record[2] for record in self.records],
+            "embeddings": [record[3] for record in self.records],
+        }
+
+
+def _record(doc_id, table_name):
+    metadata = {"type": "table_schema", "table_name": table_name, "source": "ddl_parser"}
+    return doc_id, f"Table: {table_name}", metadata, [1.0, 0.0]
+
+
+def _contents(index):
+    if isinstance(index, MetadataIndex):
+        return index.query({"type": "table_schema"})
+    if isinstance(index, LexicalIndex):
+        return [doc_id for doc_id, _ in index.search("table", 10)]
+    return [doc_id for doc_id, _ in index.search([[1.0, 0.0]], 10)[0]]
+
+
+@pytest.mark.parametrize("index_class", [MetadataIndex, LexicalIndex, ExactVectorIndex])
+def test_rebuild_racing_a_reset_is_discarded(index_class):
+    index = index_class()
+    old = FakeCollection([_record("old", "pdgitem")], on_get=index.invalidate)
+
+    assert index.rebuild(old) is False
+    assert not index.ready
+    assert _contents(index) == []
+
+    assert index.rebuild(FakeCollection([_record("new", "pdgid")])) is True
+    assert index.ready
+    assert _contents(index) == ["new"]
+
+
+@pytest.mark.parametrize("index_class", [MetadataIndex, LexicalIndex, ExactVectorIndex])
+def test_writes_during_a_rebuild_are_replayed(index_class):
+    index = index_class()
+    _, document, metadata, embedding = _record("written", "pdgdata")
+
+    def write():
+        if isinstance(index, MetadataIndex):
+            index.upsert(["written"], [metadata])
+        elif isinstance(index, LexicalIndex):
+            index.upsert(["written"], [document], [metadata])
+        else:
+            index.upsert(["written"], [document], [metadata], [embedding])
+
+    assert index.rebuild(FakeCollection([_record("scanned", "pdgitem")], on_get=write)) is True
+    assert sorted(_contents(index)) == ["scanned", "written"]
+
+
+def test_metadata_filter_rejects_non_scalar_values():
+    index = MetadataIndex()
+    index.rebuild(FakeCollection([_record("a", "pdgitem")]))
+
+    assert index.query({"table_name": {"$in": ["pdgitem", "pdgid"]}}) == ["a"]
+    with pytest.raises(InvalidFilterError):
+        index.query({"table_name": {"$in": [["pdgitem"]]}})
+    with pytest.raises(InvalidFilterError):
+        index.query({"table_name": {"$eq": {"nested": 1}}})
@@ -0,0 +1,60 @@
+import sqlite3
+
+import ingest
+from chroma_utils import get_chroma_client, parse_ddl_statements
+
+DDL = [
+    "CREATE TABLE particle (id INTEGER PRIMARY KEY, code VARCHAR, name VARCHAR)",
+    "CREATE TABLE decay (id INTEGER PRIMARY KEY, parent_id INTEGER, child_id INTEGER, "
+    "FOREIGN KEY (parent_id) REFERENCES particle (id), FOREIGN KEY (child_id) REFERENCES particle (id))",
+]
+
+
+def _source(path):
+    connection = sqlite3.connect(path)
+    for statement in DDL:
+        connection.execute(statement)
+    connection.executemany("INSERT INTO particle VALUES (?, ?, ?)", [(1, "S008", "pi+"), (2, "S003", "e+")])
+    connection.execute("INSERT INTO decay VALUES (1, 1, 2)")
+    connection.commit()
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def test_each_foreign_key_gets_its_own_label(tmp_path):
+    schemas = parse_ddl_statements(DDL)
+    connection = _source(str(tmp_path / "source.sqlite"))
+    sql, columns, labels = ingest.build_row_query("decay", schemas["decay"], schemas)
+    row = connection.execute(sql, (0, 10)).fetchone()
+
+    _, document, metadata = ingest.row_to_document("decay", row, columns, labels)
+
+    # The readable name is preferred over the code column.
+    assert "parent_id references particle name=pi+" in document
+    assert "child_id references particle name=e+" in document
+    assert metadata["parent_id_name"] == "pi+"
+    assert metadata["child_id_name"] == "e+"
+
+
+def test_checkpoint_is_discarded_when_the_source_changes(tmp_path, fake_embeddings):
+    schemas = parse_ddl_statements(DDL)
+    source_path = str(tmp_path / "source.sqlite")
+    _source(source_path).close()
+    collection = get_chroma_client().get_or_create_collection(f"ingest_{tmp_path.name}")
+
+    def ingest_decay():
+        return ingest.ingest_sqlite_rows(
+            source_path, tables=["decay"], collection=collection, parsed_schemas=schemas,
+            chunk_size=2, checkpoint_path=str(tmp_path / "checkpoints.json")
+        )["rows"]
+
+    assert ingest_decay() == 1
+    assert ingest_decay() == 0  # resumed after the checkpointed rowid
+
+    connection = sqlite3.connect(source_path)
+    connection.execute("INSERT INTO decay VALUES (2, 2, 1)")
+    connection.commit()
+    connection.close()
+
+    # The file changed, so its old rowids no longer apply and every row is read again.
+    assert ingest_decay() == 2
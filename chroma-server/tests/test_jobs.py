@@ -0,0 +1,47 @@
+import threading
+
+from jobs import FAILED, SUCCEEDED, JobQueue
+
+
+def test_jobs_run_in_order_and_queued_duplicates_coalesce():
+    queue = JobQueue()
+    release = threading.Event()
+    order = []
+
+    def blocking(job):
+        release.wait(5)
+        order.append("first")
+
+    def load(name):
+        def run(job):
+            job.progress(3, total=3, detail=name)
+            order.append(name)
+            return name
+        return run
+
+    queue.submit("load", {"n": 1}, blocking)
+    second, second_coalesced = queue.submit("load", {"n": 2}, load("second"))
+    duplicate, duplicate_coalesced = queue.submit("load", {"n": 2}, load("duplicate"))
+    release.set()
+
+    assert second.wait(5)
+    assert (second_coalesced, duplicate_coalesced) == (False, True)
+    assert duplicate is second and second.coalesced == 1
+    assert order == ["first", "second"]
+    assert second.state == SUCCEEDED and second.result == "second"
+    assert second.to_dict()["progress"] == {"documents": 3, "total": 3, "detail": "second"}
+
+
+def test_failed_job_keeps_its_error_and_the_queue_keeps_running():
+    queue = JobQueue()
+
+    def fail(job):
+        raise RuntimeError("source missing")
+
+    failed, _ = queue.submit("load", {}, fail)
+    succeeded, _ = queue.submit("load", {"retry": True}, lambda job: "ok")
+
+    assert succeeded.wait(5)
+    assert failed.state == FAILED and failed.error == "source missing"
+    assert succeeded.state == SUCCEEDED
+    assert queue.get_stats()["failed"] == 1 and queue.get_stats()["succeeded"] == 1
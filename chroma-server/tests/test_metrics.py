@@ -0,0 +1,32 @@
+from flask import Blueprint, Flask
+
+import metrics
+import serving
+
+
+def test_bounded_route_is_counted_in_async_mode(monkeypatch):
+    monkeypatch.setattr(serving, "SERVING_MODE", "async")
+    monkeypatch.setattr(metrics, "METRICS_SERVER_TIMING", True)
+    blueprint = Blueprint("metrics_test", __name__, url_prefix="/metrics_test")
+    metrics.init_request_metrics(blueprint)
+
+    @blueprint.route("/bounded")
+    @serving.bounded()
+    def bounded_view():
+        with metrics.stage("work"):
+            return "ok"
+
+    app = Flask(__name__)
+    app.register_blueprint(blueprint)
+    endpoint = "/metrics_test/bounded"
+    # The metrics are process-wide, so compare against their values before this request.
+    requests_before = metrics.REQUESTS_TOTAL._values.get((endpoint, "GET", "200"), 0)
+    in_flight_before = metrics.REQUESTS_IN_FLIGHT._values.get((endpoint,), 0)
+    response = app.test_client().get(endpoint)
+
+    assert response.status_code == 200
+    assert "work;dur=" in response.headers["Server-Timing"]
+    assert metrics.REQUESTS_TOTAL._values[(endpoint, "GET", "200")] == requests_before + 1
+    assert metrics.REQUESTS_IN_FLIGHT._values[(endpoint,)] == in_flight_before
+    rendered = metrics.render_prometheus()
+    assert f'endpoint="{endpoint}"' in rendered
@@ -0,0 +1,27 @@
+from chroma_utils import parse_ddl_statements
+from schema_graph import SchemaGraph, join_condition
+
+DDL = [
+    "CREATE TABLE item (id INTEGER PRIMARY KEY, name VARCHAR)",
+    "CREATE TABLE particle (id INTEGER PRIMARY KEY, item_id INTEGER REFERENCES item (id))",
+    "CREATE TABLE decay (id INTEGER PRIMARY KEY, particle_id INTEGER, FOREIGN KEY (particle_id) REFERENCES particle (id))",
+    "CREATE TABLE footnote (id INTEGER PRIMARY KEY, text VARCHAR)",
+]
+
+
+def test_join_path_follows_foreign_keys_in_both_directions():
+    graph = SchemaGraph(parse_ddl_statements(DDL))
+
+    path = graph.join_path("item", "decay")
+
+    assert [join_condition(edge) for edge in path] == ["particle.item_id = item.id", "decay.particle_id = particle.id"]
+    assert graph.join_path("decay", "decay") == []
+    assert graph.join_path("decay", "footnote") is None
+
+
+def test_neighbors_report_the_key_direction():
+    graph = SchemaGraph(parse_ddl_statements(DDL))
+
+    neighbors = {(neighbor["table"], neighbor["direction"]) for neighbor in graph.neighbors("particle")}
+
+    assert neighbors == {("item", "references"), ("decay", "referenced_by")}
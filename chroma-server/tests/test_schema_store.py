@@ -0,0 +1,25 @@
+from schema_store import EncodedPayload
+
+
+def test_etag_differs_per_encoding():
+    payload = EncodedPayload({"table": {"columns": [{"name": f"column_{i}"} for i in range(100)]}})
+
+    assert payload.etag_for("identity") == payload.etag
+    assert payload.etag_for("gzip") == f"{payload.etag}-gzip"
+
+
+def test_not_modified_only_for_the_served_encoding(client):
+    gzip_response = client.get("/api/schema", headers={"Accept-Encoding": "gzip"})
+    identity_response = client.get("/api/schema", headers={"Accept-Encoding": "identity"})
+    gzip_etag = gzip_response.headers["ETag"]
+    identity_etag = identity_response.headers["ETag"]
+
+    assert gzip_response.headers["Content-Encoding"] == "gzip"
+    assert gzip_etag != identity_etag
+    assert client.get("/api/schema", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}).status_code == 304
+    assert client.get("/api/schema", headers={"Accept-Encoding": "identity", "If-None-Match": identity_etag}).status_code == 304
+    # A cache holding the gzip bytes must get the identity body, not a 304 for it.
+    response = client.get("/api/schema", headers={"Accept-Encoding": "identity", "If-None-Match": gzip_etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == identity_etag
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,39 @@
+import threading
+import time
+
+import pytest
+
+from serving import BoundedExecutor, DeadlineExceededError, ServerSaturatedError
+
+
+def test_requests_beyond_workers_and_queue_are_rejected():
+    executor = BoundedExecutor(workers=1, queue_size=0)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    holder = threading.Thread(target=executor.run, args=(hold,))
+    holder.start()
+    assert started.wait(5)
+    try:
+        with pytest.raises(ServerSaturatedError) as error:
+            executor.run(lambda: "rejected")
+        assert error.value.retry_after >= 1
+    finally:
+        release.set()
+        holder.join()
+    assert executor.run(lambda: "admitted") == "admitted"
+    assert executor.get_stats()["rejected"] == 1
+
+
+def test_request_past_its_deadline_is_not_run():
+    executor = BoundedExecutor(workers=1, queue_size=1)
+    calls = []
+
+    with pytest.raises(DeadlineExceededError):
+        executor.run(lambda: calls.append("ran"), deadline=time.monotonic() - 1)
+    assert calls == []
+    assert executor.get_stats()["expired_in_queue"] == 1
@@ -0,0 +1,17 @@
+from sharding import DEFAULT_SHARD, shard_for_table, tables_in_filter
+
+
+def test_filters_narrow_the_shards_to_search():
+    assert tables_in_filter({"table_name": "pdgid"}) == {"pdgid"}
+    assert tables_in_filter({"table_name": {"$in": ["pdgid", "pdgitem"]}, "type": "column_schema"}) == {"pdgid", "pdgitem"}
+    assert tables_in_filter({"$or": [{"table_name": "pdgid"}, {"table_name": {"$eq": "pdgdata"}}]}) == {"pdgid", "pdgdata"}
+    # Any branch that does not pin table_name means every shard can match
+    assert tables_in_filter({"$or": [{"table_name": "pdgid"}, {"type": "table_schema"}]}) is None
+    assert tables_in_filter({"type": "table_schema"}) is None
+
+
+def test_shard_names_are_valid_and_distinct():
+    assert shard_for_table(None) == DEFAULT_SHARD
+    first, second = shard_for_table("order items"), shard_for_table("order_items")
+    assert first != second
+    assert all(character.isalnum() or character in "._-" for character in first)
@@ -0,0 +1,41 @@
+import pytest
+
+from chroma_utils import get_collection, get_collection_space
+from snapshot import export_snapshot, import_snapshot, read_manifest
+
+
+def _collection(name, rows, dim, configuration=None):
+    collection = get_collection(name, configuration=configuration)
+    collection.upsert(
+        ids=[f"{name}-{i}" for i in range(rows)], documents=[f"document {i}" for i in range(rows)],
+        metadatas=[{"row": i} for i in range(rows)], embeddings=[[float(i + 1)] * dim for i in range(rows)],
+    )
+    return collection
+
+
+def test_replace_recreates_the_collection_with_the_stored_config(fake_embeddings):
+    source = _collection("snapshot-cosine-source", 3, 4, {"hnsw": {"space": "cosine", "ef_construction": 150}})
+    export_snapshot("cosine", collection=source)
+    manifest = read_manifest("cosine")
+    assert (manifest["count"], manifest["dim"], manifest["space"]) == (3, 4, "cosine")
+
+    target = _collection("snapshot-cosine-target", 1, 2)
+    result = import_snapshot("cosine", collection=target, replace=True)
+
+    imported = get_collection("snapshot-cosine-target")
+    assert result["documents"] == 3
+    assert imported.count() == 3
+    assert get_collection_space(imported) == "cosine"
+    assert imported.configuration["hnsw"]["ef_construction"] == 150
+
+
+def test_incompatible_target_is_rejected_before_anything_changes(fake_embeddings):
+    export_snapshot("four-dims", collection=_collection("snapshot-l2-source", 2, 4))
+    export_snapshot("ip-space", collection=_collection("snapshot-ip-source", 2, 4, {"hnsw": {"space": "ip"}}))
+    target = _collection("snapshot-two-dims", 5, 2)
+
+    with pytest.raises(ValueError, match="dimensional"):
+        import_snapshot("four-dims", collection=target)
+    with pytest.raises(ValueError, match="space"):
+        import_snapshot("ip-space", collection=target)
+    assert target.count() == 5